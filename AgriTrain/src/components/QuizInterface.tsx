@@ -6,6 +6,7 @@ import { Progress } from "@/components/ui/progress";
 import { CheckCircle, XCircle, Trophy, ArrowLeft, Clock } from "lucide-react";
 import { useScenarios } from "@/contexts/ScenarioContext";
 import { useAuth } from "@/contexts/AuthContext";
+import { apiService, AnswerFeedback } from "@/services/api";
 
 interface QuizQuestion {
   id: number;
@@ -32,6 +33,7 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
   const [answers, setAnswers] = useState<number[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [review, setReview] = useState<{ [questionId: number]: AnswerFeedback }>({});
   
   const { submitQuizAttempt, updateProgress, getScenarioQuiz } = useScenarios();
   const { isAuthenticated, user } = useAuth();
@@ -245,6 +247,9 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
   // Use API quiz data if available, otherwise fallback to mock data
   const questions = quiz ? quiz.questions : getQuizQuestions();
   const currentQuestion = questions[currentQuestionIndex];
+  // API quizzes are delivered without answers; the server reveals them once the attempt is submitted
+  const correctAnswer = quiz ? undefined : currentQuestion?.correctAnswer;
+  const explanation = quiz ? undefined : currentQuestion?.explanation;
   const progress = questions.length > 0 ? ((currentQuestionIndex + 1) / questions.length) * 100 : 0;
 
   // Initialize answers array for fallback questions
@@ -282,14 +287,64 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
     }
   };
 
-  const handleAnswerSubmit = () => {
-    setShowExplanation(true);
+  const recordProgress = async (percentage: number) => {
+    const scenarioIdMap: { [key: string]: number } = {
+      pest: 1,
+      irrigation: 2,
+      crops: 3,
+      climate: 4
+    };
+    const scenarioId = scenarioIdMap[scenarioType];
+    if (scenarioId) {
+      await updateProgress(scenarioId, percentage);
+    }
+  };
+
+  // Submit the attempt, then fetch feedback for every answered question
+  const completeApiQuiz = async (finalAnswers: number[]) => {
+    try {
+      const answered = questions
+        .map((question: any, index: number) => ({ id: question.id, answer: finalAnswers[index] }))
+        .filter(({ answer }) => answer !== -1);
+      let correctCount = 0;
+      if (answered.length > 0) {
+        await submitQuizAttempt(quiz.id, answered.map(({ answer }) => answer), answered.map(({ id }) => id));
+        const feedback = await Promise.all(
+          answered.map(({ id, answer }) => apiService.checkQuizAnswer(quiz.id, id, answer))
+        );
+        setReview(Object.fromEntries(feedback.map((item) => [item.question_id, item])));
+        correctCount = feedback.filter((item) => item.correct).length;
+      }
+      setScore(correctCount);
+      await recordProgress((correctCount / questions.length) * 100);
+      setIsCompleted(true);
+      onComplete(correctCount);
+    } catch (error) {
+      console.error("Failed to submit quiz:", error);
+      setError("Failed to submit quiz results");
+    }
+  };
+
+  const handleAnswerSubmit = async () => {
+    if (!quiz) {
+      setShowExplanation(true);
+      return;
+    }
+    const finalAnswers = [...answers];
+    finalAnswers[currentQuestionIndex] = selectedAnswer ?? -1;
+    setAnswers(finalAnswers);
+    if (currentQuestionIndex < questions.length - 1) {
+      setCurrentQuestionIndex(currentQuestionIndex + 1);
+      setTimeLeft(30);
+    } else {
+      await completeApiQuiz(finalAnswers);
+    }
   };
 
   const handleNextQuestion = async () => {
     // Calculate score for current question
     let currentScore = score;
-    if (selectedAnswer === (currentQuestion.correct_answer ?? currentQuestion.correctAnswer)) {
+    if (selectedAnswer === correctAnswer) {
       currentScore += 1;
       setScore(currentScore);
     }
@@ -304,23 +359,7 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
         const percentage = (currentScore / questions.length) * 100;
         
         if (isAuthenticated && user) {
-          const finalAnswers = [...answers];
-          finalAnswers[currentQuestionIndex] = selectedAnswer ?? -1;
-          
-          if (quiz) {
-            await submitQuizAttempt(quiz.id, finalAnswers);
-          }
-          
-          const scenarioIdMap: { [key: string]: number } = {
-            pest: 1,
-            irrigation: 2,
-            crops: 3,
-            climate: 4
-          };
-          const scenarioId = scenarioIdMap[scenarioType];
-          if (scenarioId) {
-            await updateProgress(scenarioId, percentage);
-          }
+          await recordProgress(percentage);
         }
         
         setIsCompleted(true);
@@ -394,6 +433,29 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
             </p>
           </div>
 
+          {quiz && (
+            <div className="space-y-3 mb-6 text-left">
+              {questions.map((question: any) => {
+                const item = review[question.id];
+                return (
+                  <div key={question.id} className="p-3 rounded-lg border border-border bg-background">
+                    <p className="font-medium text-foreground mb-1">{question.question_text}</p>
+                    {item ? (
+                      <>
+                        <p className={item.correct ? 'text-farm-green' : 'text-destructive'}>
+                          {item.correct ? 'Correct' : `Answer: ${question.options[item.correct_answer]}`}
+                        </p>
+                        {item.explanation && <p className="text-sm text-muted-foreground">{item.explanation}</p>}
+                      </>
+                    ) : (
+                      <p className="text-sm text-muted-foreground">Not answered</p>
+                    )}
+                  </div>
+                );
+              })}
+            </div>
+          )}
+
           <div className="space-y-3">
             <Button variant="farm" size="lg" className="w-full" onClick={onBack}>
               Return to Dashboard
@@ -455,7 +517,7 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
             <AnimatePresence>
               {currentQuestion.options.map((option, index) => {
                 const isSelected = selectedAnswer === index;
-                const isCorrect = index === (currentQuestion.correct_answer ?? currentQuestion.correctAnswer);
+                const isCorrect = index === correctAnswer;
                 const showResult = showExplanation;
 
                 return (
@@ -503,7 +565,7 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
               className="mb-6 p-4 bg-farm-green/10 border border-farm-green/20 rounded-lg"
             >
               <h4 className="font-bold text-farm-green mb-2">Explanation</h4>
-              <p className="text-foreground">{currentQuestion.explanation}</p>
+              <p className="text-foreground">{explanation}</p>
             </motion.div>
           )}
 
@@ -518,7 +580,7 @@ const QuizInterface = ({ scenarioType, onComplete, onBack }: QuizInterfaceProps)
               </Button>
             ) : selectedAnswer !== null ? (
               <Button variant="farm" onClick={handleAnswerSubmit}>
-                Submit Answer
+                {quiz && currentQuestionIndex === questions.length - 1 ? 'Complete Quiz' : 'Submit Answer'}
               </Button>
             ) : (
               <Button variant="outline" disabled>
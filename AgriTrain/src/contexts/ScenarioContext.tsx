@@ -12,7 +12,7 @@ interface ScenarioContextType {
   updateProgress: (scenarioId: number, completionPercentage: number) => Promise<void>;
   getScenarioProgress: (scenarioId: number) => UserProgress | undefined;
   getScenarioQuiz: (scenarioId: number) => Promise<Quiz>;
-  submitQuizAttempt: (quizId: number, answers: number[]) => Promise<QuizAttempt>;
+  submitQuizAttempt: (quizId: number, answers: number[], questionIds?: number[]) => Promise<QuizAttempt>;
 }
 
 const ScenarioContext = createContext<ScenarioContextType | undefined>(undefined);
@@ -107,7 +107,7 @@ export const ScenarioProvider: React.FC<ScenarioProviderProps> = ({ children })
     }
   };
 
-  const submitQuizAttempt = async (quizId: number, answers: number[]): Promise<QuizAttempt> => {
+  const submitQuizAttempt = async (quizId: number, answers: number[], questionIds?: number[]): Promise<QuizAttempt> => {
     if (!user || !isAuthenticated) {
       throw new Error('User must be authenticated to submit quiz');
     }
@@ -117,6 +117,7 @@ export const ScenarioProvider: React.FC<ScenarioProviderProps> = ({ children })
       const attempt = await apiService.submitQuizAttempt({
         quiz_id: quizId,
         answers,
+        question_ids: questionIds,
         completed_at: new Date().toISOString(),
       });
       
@@ -151,6 +152,16 @@ export const ScenarioProvider: React.FC<ScenarioProviderProps> = ({ children })
     }
   }, [isAuthenticated, user]);
 
+  // Keep progress in sync with changes made in other tabs and devices
+  useEffect(() => {
+    if (!isAuthenticated || !user) return;
+    return apiService.subscribeToUserEvents(user.id, (type) => {
+      if (type === 'progress.updated' || type === 'quiz_attempt.submitted' || type === 'resync') {
+        refreshProgress();
+      }
+    });
+  }, [isAuthenticated, user]);
+
   const value: ScenarioContextType = {
     scenarios,
     userProgress,
@@ -29,6 +29,11 @@ export interface Question {
   id: number;
   question_text: string;
   options: string[];
+}
+
+export interface AnswerFeedback {
+  question_id: number;
+  correct: boolean;
   correct_answer: number;
   explanation?: string;
 }
@@ -89,6 +94,28 @@ export interface AuthResponse {
   session_id: number;
 }
 
+export interface EventStreamToken {
+  token: string;
+  expires_in: number;
+}
+
+export type UserEventType =
+  | 'progress.updated'
+  | 'quiz_attempt.submitted'
+  | 'session.login'
+  | 'session.logout'
+  | 'resync';
+
+const USER_EVENT_TYPES: UserEventType[] = [
+  'progress.updated',
+  'quiz_attempt.submitted',
+  'session.login',
+  'session.logout',
+  'resync',
+];
+
+const EVENT_STREAM_RETRY_MS = 3000;
+
 export interface UserSession {
   id: number;
   user_id: number;
@@ -105,6 +132,8 @@ export interface UserSession {
 class ApiService {
   private baseURL: string;
   private token: string | null = null;
+  // Read-your-writes pin from the last write; sent back so reads after it come from the primary
+  private readAfter: string | null = null;
 
   constructor(baseURL: string = API_BASE_URL) {
     this.baseURL = baseURL;
@@ -124,6 +153,9 @@ class ApiService {
     if (this.token) {
       headers.Authorization = `Bearer ${this.token}`;
     }
+    if (this.readAfter) {
+      headers['X-Read-After'] = this.readAfter;
+    }
 
     console.log('Making request to:', url);
     console.log('Request options:', { method: options.method || 'GET', headers });
@@ -135,6 +167,10 @@ class ApiService {
       });
 
       console.log('Response status:', response.status);
+      const readAfter = response.headers.get('X-Read-After');
+      if (readAfter) {
+        this.readAfter = readAfter;
+      }
       console.log('Response headers:', Object.fromEntries(response.headers.entries()));
 
       if (!response.ok) {
@@ -191,6 +227,7 @@ class ApiService {
       }
     }
     this.token = null;
+    this.readAfter = null;
     localStorage.removeItem('auth_token');
   }
 
@@ -224,9 +261,19 @@ class ApiService {
     return response;
   }
 
+  // Only answers questions the user has already submitted in an attempt
+  async checkQuizAnswer(quizId: number, questionId: number, answer: number): Promise<AnswerFeedback> {
+    const response = await this.request<AnswerFeedback>(`/quizzes/${quizId}/questions/${questionId}/check`, {
+      method: 'POST',
+      body: JSON.stringify({ answer }),
+    });
+    return response;
+  }
+
   async submitQuizAttempt(attempt: {
     quiz_id: number;
     answers: number[];
+    question_ids?: number[];
     completed_at?: string;
   }): Promise<QuizAttempt> {
     const response = await this.request<QuizAttempt>('/quiz-attempts', {
@@ -262,6 +309,68 @@ class ApiService {
     return response;
   }
 
+  // Live events
+  async getEventStreamToken(userId: number): Promise<EventStreamToken> {
+    const response = await this.request<EventStreamToken>(`/users/${userId}/events/token`, {
+      method: 'POST',
+    });
+    return response;
+  }
+
+  // EventSource cannot send the Authorization header, so each connection opens
+  // with a fresh short-lived stream token. Returns a function that closes the stream.
+  subscribeToUserEvents(
+    userId: number,
+    onEvent: (type: UserEventType, data: unknown) => void
+  ): () => void {
+    let source: EventSource | null = null;
+    let retryTimer: ReturnType<typeof setTimeout> | null = null;
+    let lastEventId: string | null = null;
+    let closed = false;
+
+    const close = () => {
+      closed = true;
+      if (retryTimer) clearTimeout(retryTimer);
+      source?.close();
+      source = null;
+    };
+
+    const reconnect = () => {
+      source?.close();
+      source = null;
+      if (!closed && this.token) {
+        retryTimer = setTimeout(connect, EVENT_STREAM_RETRY_MS);
+      }
+    };
+
+    const connect = async () => {
+      try {
+        const { token } = await this.getEventStreamToken(userId);
+        if (closed) return;
+        const params = new URLSearchParams({ token });
+        if (lastEventId) params.set('last_event_id', lastEventId);
+        source = new EventSource(`${this.baseURL}/users/${userId}/events?${params}`);
+        for (const type of USER_EVENT_TYPES) {
+          source.addEventListener(type, (event) => {
+            const message = event as MessageEvent;
+            if (message.lastEventId) lastEventId = message.lastEventId;
+            onEvent(type, JSON.parse(message.data));
+          });
+        }
+        // The session was logged out; do not reconnect
+        source.addEventListener('session.closed', close);
+        // The stream token has expired by the time the browser would retry, so reconnect with a new one
+        source.onerror = reconnect;
+      } catch (error) {
+        console.error('Event stream connection failed:', error);
+        reconnect();
+      }
+    };
+
+    connect();
+    return close;
+  }
+
   // Health check
   async healthCheck(): Promise<{ status: string }> {
     const response = await this.request<{ status: string }>('/health');
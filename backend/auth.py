@@ -3,6 +3,7 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
+import secrets
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -20,8 +21,12 @@ def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
+def new_token_id() -> str:
+    """A random fixed-width (32 hex characters) token id for the jti claim."""
+    return secrets.token_hex(16)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Create a JWT access token."""
+    """Create a JWT access token; pass a "jti" in data to tie it to a session."""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Script to benchmark response compression.
+Calls the API in-process and reports bytes on the wire and CPU time per request
+for identity, gzip and (when installed) Brotli responses. Endpoints served from
+precompressed bodies also get an on-the-fly row, the cost of compressing the
+same body on every request, for comparison.
+"""
+
+import argparse
+import asyncio
+import time
+
+from compression import SUPPORTED_ENCODINGS, compress
+from main import app
+
+PRECOMPRESSED = ("/scenarios", "/scenarios/1/quiz")
+
+async def fetch(path, headers):
+    """Run one request through the ASGI app and return (status, headers, raw body)."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+    }
+    response = {"body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
+
+async def measure(path, headers, requests):
+    """Average CPU seconds per request and the last response."""
+    result = await fetch(path, headers)  # Warm caches
+    started = time.process_time()
+    for _ in range(requests):
+        result = await fetch(path, headers)
+    return (time.process_time() - started) / requests, result
+
+async def run(paths, requests, token):
+    base = {"Authorization": f"Bearer {token}"} if token else {}
+    print(f"{'endpoint':<36} {'mode':<12} {'bytes':>9} {'ratio':>7} {'cpu ms/req':>11}")
+    for path in paths:
+        cpu, (status, headers, body) = await measure(path, {**base, "Accept-Encoding": "identity"}, requests)
+        if status != 200:
+            print(f"{path:<36} HTTP {status}, skipped")
+            continue
+        identity = len(body)
+        print(f"{path:<36} {'identity':<12} {identity:>9} {1.0:>7.2f} {cpu * 1000:>11.3f}")
+        for encoding in SUPPORTED_ENCODINGS:
+            cpu, (_, headers, body) = await measure(path, {**base, "Accept-Encoding": encoding}, requests)
+            mode = encoding if headers.get("content-encoding") == encoding else f"{encoding} (off)"
+            print(f"{'':<36} {mode:<12} {len(body):>9} {len(body) / identity:>7.2f} {cpu * 1000:>11.3f}")
+            if path in PRECOMPRESSED:
+                _, (_, _, raw) = await measure(path, {**base, "Accept-Encoding": "identity"}, 1)
+                started = time.process_time()
+                for _ in range(requests):
+                    compressed = compress(raw, encoding)
+                extra = (time.process_time() - started) / requests
+                print(f"{'':<36} {encoding + ' (live)':<12} {len(compressed):>9} "
+                      f"{len(compressed) / identity:>7.2f} {'+' + format(extra * 1000, '.3f'):>11}")
+
+def main():
+    """Benchmark compression modes for the heaviest JSON endpoints."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and mode")
+    parser.add_argument("--token", help="bearer token to include user history endpoints")
+    parser.add_argument("--user-id", type=int, help="user id for the history endpoints")
+    args = parser.parse_args()
+
+    paths = ["/scenarios", "/scenarios/1/quiz", "/scenarios/1/quiz?offset=0&limit=50"]
+    if args.token and args.user_id:
+        paths += [f"/users/{args.user_id}/quiz-attempts", f"/users/{args.user_id}/progress"]
+    asyncio.run(run(paths, args.requests, args.token))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Cached scenario catalog for GET /scenarios.
+
+The catalog changes only when a scenario is created, so its JSON body is
+encoded once and kept with precompressed variants. It is keyed on the catalog
+version, checked on the primary on every request, so a scenario created
+through another worker is picked up; invalidation only drops it early.
+"""
+
+import json
+from threading import Lock
+from typing import Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from compression import PrecompressedBody
+from database import primary_session
+from models import Scenario
+from schemas import ScenarioResponse
+from sync import catalog_version
+
+_catalog: Optional[Tuple[str, PrecompressedBody]] = None  # (catalog version, body)
+_catalog_lock = Lock()
+
+
+def get_scenario_catalog(db: Session) -> PrecompressedBody:
+    """Return the catalog body for the current catalog version, building it when it changed."""
+    global _catalog
+    with primary_session(db) as primary:
+        version = catalog_version(primary)
+        cached = _catalog
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # Read after the version, so the body is never older than the version it is kept under
+        scenarios = [ScenarioResponse.model_validate(scenario) for scenario in primary.query(Scenario).all()]
+    body = json.dumps(jsonable_encoder(scenarios), separators=(",", ":")).encode("utf-8")
+    catalog = PrecompressedBody(body)
+    with _catalog_lock:
+        _catalog = (version, catalog)
+    return catalog
+
+
+def invalidate_scenario_catalog():
+    """Drop the cached catalog early; the next request rebuilds it."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
@@ -0,0 +1,182 @@
+"""
+Response compression negotiated per Accept-Encoding.
+
+CompressionMiddleware compresses JSON and other text responses with Brotli
+(when the optional brotli package is installed) or gzip, picking the
+client's preferred encoding. Complete bodies below COMPRESSION_MINIMUM_SIZE
+are sent as-is. Streaming responses (NDJSON imports, server-sent events) are
+compressed chunk by chunk with a sync flush after each one, so every chunk
+still reaches the client immediately.
+
+Responses that already carry a Content-Encoding pass through untouched. That
+is how PrecompressedBody works: cacheable payloads such as the scenario
+catalog and full quizzes are compressed once at the highest level and served
+without per-request compression CPU.
+"""
+
+import zlib
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config import COMPRESSION_MINIMUM_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The supported encoding the client prefers, or None for identity."""
+    preferences = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        preferences[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:  # Server order breaks ties, so br wins over gzip
+        quality = preferences.get(encoding, preferences.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str, best: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else COMPRESSION_BROTLI_QUALITY)
+    compressor = zlib.compressobj(9 if best else COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        self._brotli = encoding == "br"
+
+    def chunk(self, data: bytes) -> bytes:
+        if self._brotli:
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli:
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _is_compressible(headers: Dict[bytes, bytes]) -> bool:
+    if b"content-encoding" in headers:
+        return False
+    content_type = headers.get(b"content-type", b"").decode("latin-1")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _with_encoding(raw_headers, encoding: str, length: Optional[int]):
+    headers = [(k, v) for k, v in raw_headers if k.lower() != b"content-length"]
+    headers.append((b"content-encoding", encoding.encode("latin-1")))
+    if not any(k.lower() == b"vary" for k, _ in headers):
+        headers.append((b"vary", b"Accept-Encoding"))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode("latin-1")))
+    return headers
+
+
+class CompressionMiddleware:
+    """Compress compressible responses with the client's preferred encoding."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                if message["status"] in (204, 304) or not _is_compressible(headers):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message  # Held until the first body chunk decides how to send it
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None and not more_body:
+                # Complete body in one message
+                if len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                compressed = compress(body, encoding)
+                await send({**start, "headers": _with_encoding(start["headers"], encoding, len(compressed))})
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            if stream is None:
+                stream = _StreamCompressor(encoding)
+                await send({**start, "headers": _with_encoding(start["headers"], encoding, None)})
+            data = stream.chunk(body) if body else b""
+            if not more_body:
+                data += stream.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class PrecompressedBody:
+    """A JSON body kept alongside its compressed variants, each built once."""
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self._variants: Dict[str, bytes] = {}
+
+    def variant(self, encoding: str) -> bytes:
+        compressed = self._variants.get(encoding)
+        if compressed is None:
+            compressed = self._variants[encoding] = compress(self.body, encoding, best=True)
+        return compressed
+
+    def response(self, request: Request) -> Response:
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        if encoding is None or len(self.body) < COMPRESSION_MINIMUM_SIZE:
+            return Response(content=self.body, media_type=self.media_type, headers={"Vary": "Accept-Encoding"})
+        return Response(
+            content=self.variant(encoding),
+            media_type=self.media_type,
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+        )
@@ -11,6 +11,7 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./agritrain.db")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-this-in-production-12345")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))  # Pick up other workers' logouts
 
 # CORS configuration
 ALLOWED_ORIGINS = [
@@ -22,3 +23,67 @@ ALLOWED_ORIGINS = [
 
 # Application configuration
 DEBUG = os.getenv("DEBUG", "True").lower() == "true"
+
+# Item analytics configuration
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "1000"))  # Attempts per matrix
+
+# Live event stream configuration
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_REPLAY_BUFFER = int(os.getenv("EVENTS_REPLAY_BUFFER", "100"))  # Events kept per user
+EVENTS_REPLAY_USERS = int(os.getenv("EVENTS_REPLAY_USERS", "10000"))  # Users with a replay buffer
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))  # Pending events per connection
+EVENTS_TOKEN_SECONDS = int(os.getenv("EVENTS_TOKEN_SECONDS", "60"))  # Lifetime of a stream-opening token
+
+# Idempotency key configuration
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "30"))  # In-flight claim lease
+
+# Session retention configuration
+SESSION_ARCHIVE_AFTER_DAYS = int(os.getenv("SESSION_ARCHIVE_AFTER_DAYS", "30"))  # Move ended sessions to the archive
+SESSION_ARCHIVE_RETENTION_DAYS = int(os.getenv("SESSION_ARCHIVE_RETENTION_DAYS", "365"))  # Drop archived sessions
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "500"))  # Rows per transaction
+RETENTION_INTERVAL_MINUTES = int(os.getenv("RETENTION_INTERVAL_MINUTES", "60"))  # 0 disables the background task
+
+# Read replica configuration
+# Comma-separated SQLAlchemy URLs, e.g. "sqlite:///file:agritrain.db?mode=ro&uri=true"
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))  # Pin writers to the primary
+
+# Transactional outbox configuration
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))  # Then the message is marked dead
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "2"))  # Doubles on each retry
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))  # Claim held while a batch runs
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))  # Delete delivered messages
+
+# Progress event log configuration
+PROGRESS_ROLLUP_INTERVAL_SECONDS = float(os.getenv("PROGRESS_ROLLUP_INTERVAL_SECONDS", "60"))
+PROGRESS_ROLLUP_BATCH_SIZE = int(os.getenv("PROGRESS_ROLLUP_BATCH_SIZE", "5000"))
+PROGRESS_EVENT_HORIZON_DAYS = int(os.getenv("PROGRESS_EVENT_HORIZON_DAYS", "90"))  # Older raw events are downsampled
+
+# AI guide retrieval index configuration
+GUIDE_INDEX_DIR = os.getenv("GUIDE_INDEX_DIR", "./guide_index")
+
+# Admin and bulk import configuration
+ADMIN_EMAILS = [email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()]
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))  # Users per insert transaction
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+# Analytics snapshot configuration
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "10000"))  # Rows read per query
+SNAPSHOT_INTERVAL_MINUTES = int(os.getenv("SNAPSHOT_INTERVAL_MINUTES", "15"))  # 0 disables the background task
+
+# Group-commit write queue configuration
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "False").lower() == "true"
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))  # Write units per transaction
+WRITE_QUEUE_LINGER_MS = float(os.getenv("WRITE_QUEUE_LINGER_MS", "5"))  # Wait for more units before committing
+
+# Quiz delivery configuration
+QUIZ_SAMPLE_TOKEN_HOURS = int(os.getenv("QUIZ_SAMPLE_TOKEN_HOURS", "24"))  # How long a sampled quiz can be submitted
+
+# Response compression configuration
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))  # Smaller bodies are sent as-is
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))  # Used when brotli is installed
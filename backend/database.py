@@ -1,27 +1,165 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from fastapi import Request
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import cycle
+from threading import Lock
+from typing import Dict, Optional
+import time
+
+from config import DATABASE_URL, READ_REPLICA_URLS, READ_YOUR_WRITES_SECONDS
+from auth import create_access_token, verify_token
 
 # SQLite database configuration
-SQLALCHEMY_DATABASE_URL = "sqlite:///./agritrain.db"
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
+
+def _create_engine(url: str):
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})  # Needed for SQLite
+    return create_engine(url)
 
 # Create SQLAlchemy engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Separate pool for the group-commit writer so it never waits behind request sessions
+writer_engine = _create_engine(SQLALCHEMY_DATABASE_URL)
+
+# Read-only sessions over the replica pool, handed out round-robin
+replica_engines = [_create_engine(url) for url in READ_REPLICA_URLS]
+ReplicaSessions = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines
+]
+_replica_cycle = cycle(ReplicaSessions) if ReplicaSessions else None
+_replica_lock = Lock()
+
+# user_id -> monotonic time of their last successful write in this process
+_recent_writers: Dict[int, float] = {}
+
+# Writes return a signed pin in this header; clients echo it so every worker
+# keeps their reads on the primary, not just the one that handled the write
+READ_AFTER_HEADER = "X-Read-After"
+
 # Create Base class
 Base = declarative_base()
 
+def begin_write(db):
+    """Open a write transaction explicitly, taking SQLite's write lock up front.
+
+    pysqlite only issues BEGIN before DML, so reads would otherwise run
+    outside the transaction and savepoints would not nest inside it.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def request_user_id(request: Request) -> Optional[int]:
+    """User id from the bearer token, without touching the database."""
+    return _user_id_from_authorization(request.headers.get("authorization", ""))
+
+def _user_id_from_authorization(authorization: str) -> Optional[int]:
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = verify_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
+    return int(payload["sub"])
+
+def note_write(user_id: int):
+    """Pin a user to the primary for the read-your-writes window."""
+    now = time.monotonic()
+    _recent_writers[user_id] = now
+    if len(_recent_writers) > 10000:
+        cutoff = now - READ_YOUR_WRITES_SECONDS
+        for stale in [u for u, t in _recent_writers.items() if t < cutoff]:
+            _recent_writers.pop(stale, None)
+
+def wrote_recently(user_id: Optional[int]) -> bool:
+    if user_id is None:
+        return False
+    written_at = _recent_writers.get(user_id)
+    return written_at is not None and time.monotonic() - written_at < READ_YOUR_WRITES_SECONDS
+
+def read_after_token(user_id: int) -> str:
+    """Signed pin to the primary for the user, valid for the read-your-writes window."""
+    return create_access_token(
+        {"sub": str(user_id), "scope": "read-after"},
+        expires_delta=timedelta(seconds=READ_YOUR_WRITES_SECONDS)
+    )
+
+def pinned_to_primary(request: Request) -> bool:
+    """Whether the caller wrote recently, here or through another worker that issued a pin."""
+    user_id = request_user_id(request)
+    if user_id is None:
+        return False
+    if wrote_recently(user_id):
+        return True
+    pin = request.headers.get(READ_AFTER_HEADER)
+    payload = verify_token(pin) if pin else None
+    return payload is not None and payload.get("scope") == "read-after" and payload.get("sub") == str(user_id)
+
+@contextmanager
+def primary_session(db):
+    """db itself when it reads from the primary, else a short-lived primary session.
+
+    In-process caches rebuild through this: a replica that has not caught up
+    with a change would otherwise put the old rows back into a cache that
+    was just invalidated, where they would stay until the next change.
+    """
+    if db.get_bind() in (engine, writer_engine):
+        yield db
+    else:
+        with SessionLocal() as primary:
+            yield primary
+
+# Dependency for read-only handlers: a replica session unless the caller just wrote
+def get_read_db(request: Request):
+    if _replica_cycle is None or pinned_to_primary(request):
+        db = SessionLocal()
+    else:
+        with _replica_lock:
+            db = next(_replica_cycle)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+class ReadYourWritesMiddleware:
+    """Record successful non-GET requests so get_read_db pins the writer to the primary.
+
+    The response also carries a READ_AFTER_HEADER pin for clients to send on
+    their following requests, which may reach other workers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = dict(scope["headers"])
+                authorization = headers.get(b"authorization", b"").decode("latin-1")
+                user_id = _user_id_from_authorization(authorization)
+                if user_id is not None:
+                    note_write(user_id)
+                    pin = (READ_AFTER_HEADER.lower().encode("latin-1"), read_after_token(user_id).encode("latin-1"))
+                    message = {**message, "headers": [*message.get("headers", []), pin]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,209 @@
+"""
+In-process pub/sub feeding the per-user server-sent events stream.
+
+Handlers publish after their transaction commits. Each connection gets a
+small bounded queue; a connection that falls behind is closed rather than
+buffering without limit, and the client resumes from the replay buffer using
+the Last-Event-ID header when it reconnects. Streams opened under a login
+session are closed when that session is logged out.
+"""
+
+import asyncio
+import json
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Set
+
+from config import (
+    EVENTS_HEARTBEAT_SECONDS, EVENTS_REPLAY_BUFFER, EVENTS_REPLAY_USERS, EVENTS_QUEUE_SIZE
+)
+
+RECONNECT_MILLISECONDS = 3000
+
+# Queued to a subscriber that overflowed; the stream closes so the client reconnects
+_OVERFLOW = object()
+
+# Queued to a subscriber whose session ended; the stream closes for good
+_CLOSED = object()
+
+
+class Event:
+    __slots__ = ("id", "user_id", "type", "data")
+
+    def __init__(self, event_id: int, user_id: int, event_type: str, data: dict):
+        self.id = event_id
+        self.user_id = user_id
+        self.type = event_type
+        self.data = data
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class Subscription:
+    __slots__ = ("user_id", "session_id", "queue")
+
+    def __init__(self, user_id: int, session_id: Optional[str], queue_size: int):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+
+class _ReplayBuffer:
+    __slots__ = ("events", "trimmed_through")
+
+    def __init__(self, size: int):
+        self.events: deque = deque(maxlen=size)
+        self.trimmed_through = 0  # Highest event id dropped from this buffer
+
+    def append(self, event: Event):
+        if len(self.events) == self.events.maxlen:
+            self.trimmed_through = self.events[0].id
+        self.events.append(event)
+
+
+class EventBroker:
+    """Fan out per-user events to live subscribers and keep a short replay buffer."""
+
+    def __init__(
+        self,
+        replay_size: int = EVENTS_REPLAY_BUFFER,
+        replay_users: int = EVENTS_REPLAY_USERS,
+        queue_size: int = EVENTS_QUEUE_SIZE
+    ):
+        self.replay_size = replay_size
+        self.replay_users = replay_users
+        self.queue_size = queue_size
+        self._last_id = 0
+        self._replay: "OrderedDict[int, _ReplayBuffer]" = OrderedDict()
+        self._dropped_through = 0  # Highest event id in buffers evicted for space
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def publish(self, user_id: int, event_type: str, data: dict):
+        """Publish an event; safe to call from the event loop or a worker thread."""
+        loop = self._loop
+        if loop is not None and not _running_in(loop):
+            loop.call_soon_threadsafe(self._publish, user_id, event_type, data)
+        else:
+            self._publish(user_id, event_type, data)
+
+    def _publish(self, user_id: int, event_type: str, data: dict):
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, user_id, event_type, data)
+            buffer = self._replay.get(user_id)
+            if buffer is None:
+                buffer = self._replay[user_id] = _ReplayBuffer(self.replay_size)
+                while len(self._replay) > self.replay_users:
+                    _, dropped = self._replay.popitem(last=False)
+                    self._dropped_through = max(self._dropped_through, dropped.events[-1].id)
+            else:
+                self._replay.move_to_end(user_id)
+            buffer.append(event)
+
+        for subscription in list(self._subscribers.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._overflow(subscription)
+
+    def _overflow(self, subscription: Subscription):
+        """Disconnect a slow consumer; it will resume via Last-Event-ID."""
+        self._disconnect(subscription, _OVERFLOW)
+
+    def _disconnect(self, subscription: Subscription, reason):
+        self.unsubscribe(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(reason)
+
+    def close_session(self, user_id: int, session_id: str) -> int:
+        """Close the user's streams opened under a session; must be called from the event loop."""
+        closing = [s for s in self._subscribers.get(user_id, ()) if s.session_id == session_id]
+        for subscription in closing:
+            self._disconnect(subscription, _CLOSED)
+        return len(closing)
+
+    def subscribe(self, user_id: int, session_id: Optional[str] = None) -> Subscription:
+        """Register a subscriber; must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, session_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def replay(self, user_id: int, last_event_id: int) -> Optional[List[Event]]:
+        """Events after last_event_id, or None if the buffer no longer covers the gap."""
+        with self._lock:
+            if last_event_id > self._last_id:
+                return None  # Id from before a restart
+            buffer = self._replay.get(user_id)
+            if buffer is None:
+                return None if last_event_id < self._dropped_through else []
+            if last_event_id < buffer.trimmed_through:
+                return None
+            return [event for event in buffer.events if event.id > last_event_id]
+
+    def connection_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def _running_in(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+broker = EventBroker()
+
+
+async def event_stream(
+    user_id: int,
+    last_event_id: Optional[int] = None,
+    session_id: Optional[str] = None,
+    heartbeat_seconds: float = EVENTS_HEARTBEAT_SECONDS
+):
+    """Yield SSE frames for a user's events until the client goes away.
+
+    The subscription is made here, when the response starts streaming, so a
+    request that never gets that far leaves no subscriber behind.
+    """
+    subscription = broker.subscribe(user_id, session_id)
+    try:
+        # Subscribe before reading the backlog so nothing published in between is lost
+        backlog = [] if last_event_id is None else broker.replay(user_id, last_event_id)
+        yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+        last_sent = 0
+        if backlog is None:
+            # Missed events are gone; tell the client to re-fetch its lists once
+            yield "event: resync\ndata: {}\n\n"
+        else:
+            for event in backlog:
+                last_sent = event.id
+                yield event.encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if event is _OVERFLOW:
+                break
+            if event is _CLOSED:
+                yield "event: session.closed\ndata: {}\n\n"
+                break
+            if event.id <= last_sent:
+                continue  # Already sent from the replay backlog
+            last_sent = event.id
+            yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,199 @@
+"""
+Idempotency-Key support for retried write requests.
+
+The first request with a key claims it by inserting a row without a response,
+then runs the write unit. The serialized response is stored in the unit's own
+transaction, by completing the claim row only if it is still ours, so the
+write and its stored response commit together or not at all. Retries with the
+same key and the same request fingerprint get the stored response back without
+touching the write path. Concurrent duplicates in this process wait for the
+first one to finish; duplicates in another process get 409 until it does.
+
+A claim whose request died is reclaimed after IDEMPOTENCY_LOCK_SECONDS. If the
+original request was only slow, its completion finds the claim gone and its
+write rolls back, so a write never runs twice under one key.
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import IDEMPOTENCY_LOCK_SECONDS, IDEMPOTENCY_TTL_HOURS
+from models import IdempotencyRecord
+from write_queue import WriteUnit, run_write
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+
+
+def request_fingerprint(request: Request, payload: Any) -> str:
+    """Hash of method, path and canonical JSON body."""
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    raw = f"{request.method} {request.url.path}\n{body}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _replay(record: IdempotencyRecord) -> JSONResponse:
+    return JSONResponse(
+        status_code=record.status_code,
+        content=json.loads(record.response_body),
+        headers={REPLAYED_HEADER: "true"}
+    )
+
+
+def _find(db: Session, user_id: int, key: str) -> Optional[IdempotencyRecord]:
+    return db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.user_id == user_id,
+        IdempotencyRecord.idempotency_key == key
+    ).first()
+
+
+def _check(db: Session, record: IdempotencyRecord, fingerprint: str) -> Optional[IdempotencyRecord]:
+    """Validate an existing record; returns None if it was stale and removed."""
+    now = datetime.utcnow()
+    if record.expires_at <= now:
+        db.delete(record)
+        db.commit()
+        return None
+    if record.status_code is None and record.created_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS):
+        # Reclaim the lapsed claim only if it is still incomplete
+        deleted = db.execute(
+            delete(IdempotencyRecord).where(
+                IdempotencyRecord.id == record.id,
+                IdempotencyRecord.status_code.is_(None)
+            )
+        ).rowcount
+        db.commit()
+        if deleted:
+            return None
+        db.refresh(record)  # Completed just before we could reclaim it
+    if record.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request"
+        )
+    return record
+
+
+def _completing(unit: WriteUnit, claim_id: int, response_model: Type[BaseModel]) -> WriteUnit:
+    """Wrap a unit so it also stores its response on the claim, in the same transaction."""
+    def complete(session: Session):
+        result, event = unit(session)
+        body = jsonable_encoder(response_model.model_validate(result))
+        completed = session.execute(
+            update(IdempotencyRecord).where(
+                IdempotencyRecord.id == claim_id,
+                IdempotencyRecord.status_code.is_(None)
+            ).values(status_code=200, response_body=json.dumps(body))
+        ).rowcount
+        if not completed:
+            # The claim lapsed and was taken over by a retry; raising rolls this write back
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        return body, event
+    return complete
+
+
+async def run_idempotent(
+    request: Request,
+    db: Session,
+    user_id: int,
+    payload: Any,
+    unit: WriteUnit,
+    publish: Callable[[Any], None],
+    response_model: Type[BaseModel]
+):
+    """Run a write unit at most once per Idempotency-Key and replay its response.
+
+    unit(session) returns (result, event) and runs through run_write;
+    publish(event) is called once it has committed. Without the header this
+    simply runs the unit.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        result, event = await run_write(db, unit)
+        publish(event)
+        return result
+
+    slot = (user_id, key)
+    pending = _inflight.get(slot)
+    if pending is not None:
+        db.commit()  # Don't hold a pooled connection while waiting
+        await asyncio.shield(pending)
+
+    fingerprint = request_fingerprint(request, payload)
+    record = _find(db, user_id, key)
+    if record is not None:
+        record = _check(db, record, fingerprint)
+    if record is not None:
+        if record.status_code is None:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        return _replay(record)
+
+    now = datetime.utcnow()
+    record = IdempotencyRecord(
+        user_id=user_id,
+        idempotency_key=key,
+        fingerprint=fingerprint,
+        created_at=now,
+        expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+    )
+    db.add(record)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another worker claimed the key between our lookup and insert
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed"
+        )
+    claim_id = record.id
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[slot] = future
+    try:
+        try:
+            body, event = await run_write(db, _completing(unit, claim_id, response_model))
+        except BaseException:
+            # Release the claim so a retry can run; a lapsed claim is already gone
+            db.rollback()
+            db.execute(
+                delete(IdempotencyRecord).where(
+                    IdempotencyRecord.id == claim_id,
+                    IdempotencyRecord.status_code.is_(None)
+                )
+            )
+            db.commit()
+            raise
+        publish(event)
+        return JSONResponse(content=body)
+    finally:
+        del _inflight[slot]
+        future.set_result(None)
+
+
+def purge_expired_keys(db: Session) -> int:
+    """Delete idempotency records past their TTL."""
+    deleted = db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
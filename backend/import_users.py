@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Script to bulk-import users from a CSV or JSON file.
+CSV files need a header row with email, username, password and optionally full_name.
+"""
+
+import json
+import sys
+
+from database import SessionLocal
+from user_import import parse_rows, import_users
+
+def main():
+    """Import users from the file given on the command line."""
+    if len(sys.argv) != 2:
+        print("Usage: python import_users.py <users.csv|users.json>")
+        sys.exit(1)
+    path = sys.argv[1]
+    with open(path, "rb") as f:
+        rows = parse_rows(f.read(), "json" if path.endswith(".json") else "csv")
+
+    counts = {}
+    db = SessionLocal()
+    try:
+        print(f"Importing {len(rows)} users from {path}...")
+        for result in import_users(db, rows):
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            if result["status"] != "created":
+                print(json.dumps(result))
+    finally:
+        db.close()
+    print(", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "Nothing to import")
+
+if __name__ == "__main__":
+    main()
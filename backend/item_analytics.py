@@ -0,0 +1,205 @@
+"""
+Per-question item analytics for quizzes.
+
+Attempts are streamed from the database in batches and folded into an
+attempt x question answer matrix per quiz. From that matrix we keep running
+sums per question (responses, correct answers, score moments and option
+selections), so difficulty (p-value) and point-biserial discrimination can be
+updated incrementally from new attempts only, using QuizAttempt.id as a
+high-water mark. Refreshes of the same quiz are serialized on its watermark
+row so attempts are never folded in twice.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import ANALYTICS_BATCH_SIZE
+from database import begin_write
+from models import AnalyticsWatermark, Quiz, QuizAttempt, QuizQuestion, QuestionStat
+
+UNANSWERED = -1
+
+
+def build_answer_matrix(attempts, option_counts: np.ndarray) -> np.ndarray:
+    """Answer matrix (attempts x questions) with UNANSWERED for skipped cells.
+
+    Answers outside a question's options (stored before submissions were
+    range-checked) are treated as unanswered rather than overflowing the matrix.
+    """
+    num_questions = len(option_counts)
+    matrix = np.full((len(attempts), num_questions), UNANSWERED, dtype=np.int16)
+    for row, (answers, question_ids) in enumerate(attempts):
+        if question_ids is None:
+            question_ids = range(1, num_questions + 1)
+        for question_id, answer in zip(question_ids, answers):
+            if not 1 <= question_id <= num_questions or not isinstance(answer, int):
+                continue
+            if 0 <= answer < option_counts[question_id - 1]:
+                matrix[row, question_id - 1] = answer
+    return matrix
+
+
+def batch_sums(matrix: np.ndarray, key: np.ndarray, num_options: int) -> dict:
+    """Per-question sufficient statistics for one batch of attempts."""
+    answered = matrix != UNANSWERED
+    correct = (matrix == key) & answered
+
+    answered_count = answered.sum(axis=1)
+    keep = answered_count > 0
+    answered, correct, matrix = answered[keep], correct[keep], matrix[keep]
+    score = correct.sum(axis=1) / answered_count[keep]
+
+    score_col = score[:, None]
+    options = np.arange(num_options, dtype=np.int16)
+    return {
+        "attempts": int(keep.sum()),
+        "responses": answered.sum(axis=0),
+        "correct": correct.sum(axis=0),
+        "sum_score": (answered * score_col).sum(axis=0),
+        "sum_score_sq": (answered * score_col ** 2).sum(axis=0),
+        "sum_correct_score": (correct * score_col).sum(axis=0),
+        # (attempts, questions, options) -> selections per question and option
+        "option_counts": (matrix[:, :, None] == options).sum(axis=0),
+    }
+
+
+def point_biserial(n, correct, sum_score, sum_score_sq, sum_correct_score) -> Optional[float]:
+    """Point-biserial correlation between a binary item and the score, from sums."""
+    if n < 2:
+        return None
+    numerator = n * sum_correct_score - correct * sum_score
+    denominator = (n * correct - correct ** 2) * (n * sum_score_sq - sum_score ** 2)
+    if denominator <= 0:
+        return None
+    return float(numerator / np.sqrt(denominator))
+
+
+def _fold_batch(stats: List[QuestionStat], sums: dict, questions: List[QuizQuestion]):
+    for j, (stat, question) in enumerate(zip(stats, questions)):
+        stat.responses += int(sums["responses"][j])
+        stat.correct += int(sums["correct"][j])
+        stat.sum_score += float(sums["sum_score"][j])
+        stat.sum_score_sq += float(sums["sum_score_sq"][j])
+        stat.sum_correct_score += float(sums["sum_correct_score"][j])
+        counts = stat.option_counts or [0] * len(question.options)
+        stat.option_counts = [
+            count + int(sums["option_counts"][j, o]) for o, count in enumerate(counts)
+        ]
+
+
+def _finalize(stat: QuestionStat):
+    if stat.responses:
+        stat.difficulty = stat.correct / stat.responses
+    stat.discrimination = point_biserial(
+        stat.responses, stat.correct, stat.sum_score, stat.sum_score_sq, stat.sum_correct_score
+    )
+
+
+def _lock_watermark(db: Session, quiz_id: int) -> AnalyticsWatermark:
+    """The quiz's watermark row, created if missing and locked for this transaction."""
+    db.commit()  # The lock has to be taken at the start of a transaction
+    if db.query(AnalyticsWatermark.quiz_id).filter(AnalyticsWatermark.quiz_id == quiz_id).first() is None:
+        try:
+            db.add(AnalyticsWatermark(quiz_id=quiz_id, last_attempt_id=0, attempts_processed=0))
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # A concurrent refresh created it first
+    begin_write(db)
+    return db.query(AnalyticsWatermark).filter(
+        AnalyticsWatermark.quiz_id == quiz_id
+    ).with_for_update().populate_existing().one()
+
+
+def refresh_quiz_analytics(db: Session, quiz_id: int, batch_size: int = ANALYTICS_BATCH_SIZE) -> int:
+    """Fold attempts newer than the quiz's watermark into its question stats.
+
+    Returns the number of attempts processed.
+    """
+    watermark = _lock_watermark(db, quiz_id)
+    questions = db.query(QuizQuestion).filter(
+        QuizQuestion.quiz_id == quiz_id
+    ).order_by(QuizQuestion.position).all()
+    if not questions:
+        db.commit()
+        return 0
+
+    existing = {
+        stat.question_id: stat
+        for stat in db.query(QuestionStat).filter(QuestionStat.quiz_id == quiz_id)
+    }
+    stats = []
+    for question in questions:
+        stat = existing.get(question.id)
+        if stat is None:
+            stat = QuestionStat(
+                question_id=question.id, quiz_id=quiz_id, responses=0, correct=0,
+                sum_score=0.0, sum_score_sq=0.0, sum_correct_score=0.0
+            )
+            db.add(stat)
+        stats.append(stat)
+
+    key = np.array([question.correct_answer for question in questions], dtype=np.int16)
+    option_counts = np.array([len(question.options) for question in questions])
+    num_options = int(option_counts.max())
+
+    attempts = db.query(QuizAttempt.id, QuizAttempt.answers, QuizAttempt.question_ids).filter(
+        QuizAttempt.quiz_id == quiz_id,
+        QuizAttempt.id > watermark.last_attempt_id
+    ).order_by(QuizAttempt.id).yield_per(batch_size)
+
+    processed = 0
+    batch = []
+    last_id = watermark.last_attempt_id
+    for attempt_id, answers, question_ids in attempts:
+        batch.append((answers, question_ids))
+        last_id = attempt_id
+        if len(batch) >= batch_size:
+            sums = batch_sums(build_answer_matrix(batch, option_counts), key, num_options)
+            _fold_batch(stats, sums, questions)
+            processed += sums["attempts"]
+            batch = []
+    if batch:
+        sums = batch_sums(build_answer_matrix(batch, option_counts), key, num_options)
+        _fold_batch(stats, sums, questions)
+        processed += sums["attempts"]
+
+    for stat in stats:
+        _finalize(stat)
+    watermark.last_attempt_id = last_id
+    watermark.attempts_processed += processed
+    db.commit()
+    return processed
+
+
+def refresh_all_analytics(db: Session, batch_size: int = ANALYTICS_BATCH_SIZE) -> int:
+    """Run the incremental analytics job for every quiz."""
+    quiz_ids = [quiz_id for (quiz_id,) in db.query(Quiz.id).order_by(Quiz.id)]
+    return sum(refresh_quiz_analytics(db, quiz_id, batch_size) for quiz_id in quiz_ids)
+
+
+def get_quiz_analytics(db: Session, quiz_id: int) -> dict:
+    """Stored analytics for a quiz in the QuizAnalyticsResponse shape."""
+    watermark = db.query(AnalyticsWatermark).filter(AnalyticsWatermark.quiz_id == quiz_id).first()
+    rows = db.query(QuizQuestion.position, QuestionStat).join(
+        QuestionStat, QuestionStat.question_id == QuizQuestion.id
+    ).filter(QuizQuestion.quiz_id == quiz_id).order_by(QuizQuestion.position).all()
+
+    questions = []
+    for position, stat in rows:
+        counts = stat.option_counts or []
+        questions.append({
+            "question_id": position + 1,
+            "responses": stat.responses,
+            "difficulty": stat.difficulty,
+            "discrimination": stat.discrimination,
+            "option_rates": [count / stat.responses if stat.responses else 0.0 for count in counts],
+        })
+    return {
+        "quiz_id": quiz_id,
+        "attempts_processed": watermark.attempts_processed if watermark else 0,
+        "last_attempt_id": watermark.last_attempt_id if watermark else 0,
+        "questions": questions,
+    }
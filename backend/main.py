@@ -1,23 +1,61 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import uvicorn
-from fastapi.responses import JSONResponse
-from datetime import datetime
+import asyncio
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from datetime import datetime, timedelta
 
-from database import get_db, engine
-from models import Base, User, Scenario, Quiz, QuizAttempt, UserProgress, UserSession
+from database import (
+    get_db, get_read_db, engine, SessionLocal, ReadYourWritesMiddleware, note_write,
+    READ_AFTER_HEADER
+)
+from models import Base, User, Scenario, Quiz, QuizAttempt, UserProgress, UserSession, ProgressEvent
 from schemas import (
     UserCreate, UserResponse, ScenarioResponse, QuizResponse, 
     QuizAttemptCreate, QuizAttemptResponse, UserProgressResponse,
-    ScenarioCreate, QuizCreate, UserSessionResponse, UserSessionCreate
+    ScenarioCreate, QuizCreate, UserSessionResponse, UserSessionCreate,
+    ScenarioAvailability, QuizAnalyticsResponse, SyncResponse,
+    ProgressEventResponse, ProgressRollupResponse, GuideQuestion, GuideAnswer,
+    FunnelReport, ScoreDistributionReport, RetentionReport,
+    QuizDeliveryResponse, AnswerCheck, AnswerFeedback, EventStreamToken
+)
+from auth import create_access_token, new_token_id, verify_token, get_password_hash, verify_password
+from prerequisites import (
+    get_prerequisite_graph, invalidate_prerequisite_graph, get_completed_scenario_ids
+)
+from quiz_questions import (
+    build_question_rows, quiz_to_dict
+)
+from migrations import run_migrations
+from item_analytics import refresh_quiz_analytics, get_quiz_analytics
+from events import broker, event_stream
+from idempotency import run_idempotent
+from catalog import get_scenario_catalog, invalidate_scenario_catalog
+from compression import CompressionMiddleware
+from quiz_delivery import get_quiz_delivery, get_scenario_quiz_delivery, invalidate_quiz_deliveries
+from write_queue import write_queue, run_write
+from sync import collect_changes
+from retention import retention_loop
+from revocation import is_revoked, revoke, load_revocations, revocation_loop
+from outbox import enqueue, outbox_worker, outbox_metrics
+from progress_log import rollup_loop, get_scenario_rollups, PERIODS
+from retrieval import get_guide_index, invalidate_guide_index
+from fastapi.concurrency import run_in_threadpool
+from user_import import parse_rows, import_users
+from snapshots import (
+    snapshot_loop, get_snapshot, completion_funnels, score_distributions, cohort_retention
 )
-from auth import create_access_token, verify_token, get_password_hash, verify_password
+from config import (
+    RETENTION_INTERVAL_MINUTES, ADMIN_EMAILS, SNAPSHOT_INTERVAL_MINUTES, WRITE_QUEUE_ENABLED, EVENTS_TOKEN_SECONDS
+)
+import json
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(
     title="AgriTrain API",
@@ -32,13 +70,56 @@ app.add_middleware(
     allow_credentials=False,  # Set to False when allowing all origins
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[READ_AFTER_HEADER],  # Read-your-writes pin the client echoes back
 )
 
+# Route a user's reads to the primary for a short window after they write
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Compress large JSON and streamed responses for slow links
+app.add_middleware(CompressionMiddleware)
+
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+@app.on_event("startup")
+def load_token_revocations():
+    # Logged-out tokens stay rejected across restarts until they expire
+    with SessionLocal() as db:
+        load_revocations(db)
+
+# Background maintenance tasks
+_background_tasks = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if WRITE_QUEUE_ENABLED:
+        _background_tasks.append(write_queue.start())
+    _background_tasks.append(asyncio.create_task(outbox_worker(engine)))
+    _background_tasks.append(asyncio.create_task(rollup_loop(engine)))
+    # Logouts handled by other workers also close this worker's streams for that session
+    _background_tasks.append(asyncio.create_task(revocation_loop(engine, broker.close_session)))
+    _background_tasks.append(asyncio.create_task(run_in_threadpool(_warm_guide_index)))
+    if RETENTION_INTERVAL_MINUTES > 0:
+        _background_tasks.append(asyncio.create_task(retention_loop(engine)))
+    if SNAPSHOT_INTERVAL_MINUTES > 0:
+        _background_tasks.append(asyncio.create_task(snapshot_loop(engine)))
+
+def _warm_guide_index():
+    with SessionLocal() as db:
+        get_guide_index(db)
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
 
 # Dependency to get current user
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    token = credentials.credentials
+    return _authenticate(credentials.credentials, db)
+
+def _authenticate(token: str, db: Session) -> User:
     payload = verify_token(token)
     if payload is None:
         raise HTTPException(
@@ -46,6 +127,21 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if payload.get("scope") is not None:
+        # Scoped tokens (event stream tokens) only open what they were issued for
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Tokens issued before session ids were added have no jti and cannot be revoked
+    jti = payload.get("jti")
+    if jti is not None and is_revoked(jti, db):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     user_id = payload.get("sub")
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
@@ -56,6 +152,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     return user
 
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    if current_user.email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 @app.get("/")
 async def root():
     return {"message": "AgriTrain API is running!"}
@@ -64,6 +165,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/outbox")
+async def get_outbox_metrics(current_user: User = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Outbox queue depth, dead messages and lag in seconds."""
+    return outbox_metrics(db)
+
 # Add explicit OPTIONS handler for CORS
 @app.options("/{path:path}")
 async def options_handler(path: str):
@@ -80,15 +186,21 @@ async def options_handler(path: str):
 @app.post("/auth/register", response_model=UserResponse)
 async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+    _check_email_available(db, user.email)
+    
+    # Hash before queueing the write so the writer never waits on bcrypt
+    hashed_password = get_password_hash(user.password)
+    return await run_write(db, lambda session: _create_user(session, user, hashed_password))
+
+def _check_email_available(db: Session, email: str):
+    if db.query(User).filter(User.email == email).first():
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
-    
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+
+def _create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
+    _check_email_available(db, user.email)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -96,9 +208,8 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         full_name=user.full_name
     )
     db.add(db_user)
-    db.commit()
+    db.flush()
     db.refresh(db_user)
-    
     return db_user
 
 @app.post("/auth/login")
@@ -123,27 +234,34 @@ async def login_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": str(user.id)})
+    token_id = new_token_id()
+    access_token = create_access_token(data={"sub": str(user.id), "jti": token_id})
     
     # Create user session record
     client_ip = request.client.host if request.client else None
     user_agent = request.headers.get("user-agent")
     
-    user_session = UserSession(
-        user_id=user.id,
-        session_token=access_token,
-        ip_address=client_ip,
-        user_agent=user_agent
-    )
-    db.add(user_session)
-    db.commit()
-    db.refresh(user_session)
+    def record_session(session: Session) -> int:
+        user_session = UserSession(
+            user_id=user.id,
+            session_token=token_id,
+            ip_address=client_ip,
+            user_agent=user_agent
+        )
+        session.add(user_session)
+        session.flush()
+        enqueue(session, "session.login", {"user_id": user.id, "session_id": user_session.id, "ip_address": client_ip})
+        return user_session.id
+    
+    session_id = await run_write(db, record_session)
+    note_write(user.id)
+    broker.publish(user.id, "session.login", {"session_id": session_id})
     
     return {
         "access_token": access_token, 
         "token_type": "bearer", 
         "user": user,
-        "session_id": user_session.id
+        "session_id": session_id
     }
 
 @app.get("/auth/me", response_model=UserResponse)
@@ -152,19 +270,29 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 @app.post("/auth/logout")
 async def logout_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Find active session and mark as inactive
+    # End the session this token belongs to; legacy tokens without a jti were stored whole
+    payload = verify_token(credentials.credentials)
+    jti = payload.get("jti")
     active_session = db.query(UserSession).filter(
+        UserSession.session_token == (jti or credentials.credentials),
         UserSession.user_id == current_user.id,
         UserSession.is_active == True
     ).first()
+    if jti is not None:
+        revoke(jti, payload["exp"])
     
     if active_session:
         active_session.is_active = False
         active_session.logout_time = datetime.utcnow()
+        enqueue(db, "session.logout", {"user_id": current_user.id, "session_id": active_session.id})
         db.commit()
+        broker.publish(current_user.id, "session.logout", {"session_id": active_session.id})
+    if jti is not None:
+        broker.close_session(current_user.id, jti)
     
     return {"message": "Logged out successfully"}
 
@@ -173,7 +301,7 @@ async def logout_user(
 async def get_user_sessions(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this user's sessions")
@@ -185,7 +313,7 @@ async def get_user_sessions(
 async def get_active_user_sessions(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this user's sessions")
@@ -198,12 +326,11 @@ async def get_active_user_sessions(
 
 # Scenario endpoints
 @app.get("/scenarios", response_model=List[ScenarioResponse])
-async def get_scenarios(db: Session = Depends(get_db)):
-    scenarios = db.query(Scenario).all()
-    return scenarios
+async def get_scenarios(request: Request, db: Session = Depends(get_read_db)):
+    return get_scenario_catalog(db).response(request)
 
 @app.get("/scenarios/{scenario_id}", response_model=ScenarioResponse)
-async def get_scenario(scenario_id: int, db: Session = Depends(get_db)):
+async def get_scenario(scenario_id: int, db: Session = Depends(get_read_db)):
     scenario = db.query(Scenario).filter(Scenario.id == scenario_id).first()
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
@@ -211,75 +338,181 @@ async def get_scenario(scenario_id: int, db: Session = Depends(get_db)):
 
 @app.post("/scenarios", response_model=ScenarioResponse)
 async def create_scenario(scenario: ScenarioCreate, db: Session = Depends(get_db)):
+    graph = get_prerequisite_graph(db)
+    unknown = [p for p in scenario.prerequisites or [] if p not in graph]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown prerequisite scenarios: {unknown}")
+    
     db_scenario = Scenario(**scenario.dict())
     db.add(db_scenario)
     db.commit()
     db.refresh(db_scenario)
+    invalidate_prerequisite_graph()
+    invalidate_guide_index()
+    invalidate_scenario_catalog()
     return db_scenario
 
+@app.get("/users/{user_id}/scenarios/available", response_model=List[ScenarioAvailability])
+async def get_available_scenarios(
+    user_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this user's scenarios")
+    
+    graph = get_prerequisite_graph(db)
+    completed = get_completed_scenario_ids(db, user_id)
+    return graph.availability(completed)
+
 # Quiz endpoints
-@app.get("/scenarios/{scenario_id}/quiz", response_model=QuizResponse)
-async def get_scenario_quiz(scenario_id: int, db: Session = Depends(get_db)):
-    quiz = db.query(Quiz).filter(Quiz.scenario_id == scenario_id).first()
-    if not quiz:
+@app.get("/scenarios/{scenario_id}/quiz", response_model=QuizDeliveryResponse)
+async def get_scenario_quiz(
+    scenario_id: int,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    sample: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_read_db)
+):
+    """The scenario's quiz without answers, served from pre-encoded bytes."""
+    delivery = get_scenario_quiz_delivery(db, scenario_id)
+    if delivery is None:
         raise HTTPException(status_code=404, detail="Quiz not found for this scenario")
-    return quiz
+    if offset == 0 and limit is None and sample is None:
+        return delivery.full_body.response(request)
+    return Response(content=delivery.select(offset, limit, sample), media_type="application/json")
+
+@app.post("/quizzes/{quiz_id}/questions/{question_id}/check", response_model=AnswerFeedback)
+async def check_quiz_answer(
+    quiz_id: int,
+    question_id: int,
+    check: AnswerCheck,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)  # Must see the attempt that was just submitted
+):
+    """Whether an answer is correct, with the correct option and explanation for feedback.
+
+    Only available once the user has recorded an attempt that answered the
+    question, so the key cannot be read before submitting.
+    """
+    delivery = get_quiz_delivery(db, quiz_id)
+    if delivery is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if not 1 <= question_id <= delivery.total_questions:
+        raise HTTPException(status_code=404, detail="Question not found")
+    attempts = db.query(QuizAttempt.answers, QuizAttempt.question_ids).filter(
+        QuizAttempt.user_id == current_user.id,
+        QuizAttempt.quiz_id == quiz_id
+    ).all()
+    if not any(question_id in (ids or range(1, len(answers) + 1)) for answers, ids in attempts):
+        raise HTTPException(status_code=403, detail="Submit an attempt that answers this question first")
+    correct_answer = int(delivery.answer_key[question_id - 1])
+    return {
+        "question_id": question_id,
+        "correct": check.answer == correct_answer,
+        "correct_answer": correct_answer,
+        "explanation": delivery.explanations[question_id - 1],
+    }
 
 @app.post("/quizzes", response_model=QuizResponse)
 async def create_quiz(quiz: QuizCreate, db: Session = Depends(get_db)):
-    db_quiz = Quiz(**quiz.dict())
+    db_quiz = Quiz(**quiz.dict(exclude={"questions"}))
+    db_quiz.questions = build_question_rows(quiz.questions)
     db.add(db_quiz)
     db.commit()
     db.refresh(db_quiz)
-    return db_quiz
+    invalidate_guide_index()
+    invalidate_quiz_deliveries()
+    return quiz_to_dict(db_quiz, db_quiz.questions, len(db_quiz.questions))
+
+# Quiz analytics endpoints
+@app.get("/quizzes/{quiz_id}/analytics", response_model=QuizAnalyticsResponse)
+async def get_quiz_item_analytics(
+    quiz_id: int,
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_read_db)
+):
+    if not db.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return get_quiz_analytics(db, quiz_id)
+
+@app.post("/quizzes/{quiz_id}/analytics/refresh", response_model=QuizAnalyticsResponse)
+async def refresh_quiz_item_analytics(
+    quiz_id: int,
+    current_user: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    if not db.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    # Waits on the write lock and folds a batch of attempts; keep it off the event loop
+    await run_in_threadpool(refresh_quiz_analytics, db, quiz_id)
+    return get_quiz_analytics(db, quiz_id)
 
 # Quiz attempt endpoints
 @app.post("/quiz-attempts", response_model=QuizAttemptResponse)
 async def submit_quiz_attempt(
     attempt: QuizAttemptCreate, 
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Calculate score
-    quiz = db.query(Quiz).filter(Quiz.id == attempt.quiz_id).first()
+    user_id = current_user.id
+    
+    return await run_idempotent(
+        request, db, user_id, attempt,
+        lambda session: _record_quiz_attempt(session, attempt, user_id),
+        lambda event: broker.publish(user_id, "quiz_attempt.submitted", event),
+        QuizAttemptResponse
+    )
+
+def _record_quiz_attempt(db: Session, attempt: QuizAttemptCreate, user_id: int) -> Tuple[QuizAttempt, dict]:
+    # Grade against the cached answer key
+    quiz = get_quiz_delivery(db, attempt.quiz_id)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Simple scoring - count correct answers
-    correct_answers = 0
-    total_questions = len(quiz.questions)
-    
-    for i, user_answer in enumerate(attempt.answers):
-        if i < len(quiz.questions):
-            question = quiz.questions[i]
-            correct_answer = question.get("correct_answer") if isinstance(question, dict) else getattr(question, 'correct_answer', None)
-            if user_answer == correct_answer:
-                correct_answers += 1
+    if not attempt.answers:
+        raise HTTPException(status_code=422, detail="answers must not be empty")
+    try:
+        positions = quiz.positions_for(attempt.question_ids, len(attempt.answers))
+        graded = quiz.graded_positions(attempt.sample_token)
+        correct_answers, total_questions = quiz.grade(positions, attempt.answers, graded)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
     score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
     is_passed = score >= quiz.passing_score
     
     # Create quiz attempt
     db_attempt = QuizAttempt(
-        user_id=current_user.id,
+        user_id=user_id,
         quiz_id=attempt.quiz_id,
         answers=attempt.answers,
+        question_ids=attempt.question_ids,
         score=score,
         is_passed=is_passed,
         started_at=datetime.utcnow(),
         completed_at=attempt.completed_at or datetime.utcnow()
     )
     db.add(db_attempt)
-    db.commit()
+    db.flush()
+    event = {
+        "attempt_id": db_attempt.id,
+        "quiz_id": db_attempt.quiz_id,
+        "score": db_attempt.score,
+        "is_passed": db_attempt.is_passed
+    }
+    enqueue(db, "quiz_attempt.submitted", {"user_id": user_id, **event})
     db.refresh(db_attempt)
     
-    return db_attempt
+    return db_attempt, event
 
 @app.get("/users/{user_id}/quiz-attempts", response_model=List[QuizAttemptResponse])
 async def get_user_quiz_attempts(
     user_id: int, 
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this user's attempts")
@@ -292,7 +525,7 @@ async def get_user_quiz_attempts(
 async def get_user_progress(
     user_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this user's progress")
@@ -304,18 +537,37 @@ async def get_user_progress(
 async def update_user_progress(
     user_id: int,
     progress_data: dict,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this user's progress")
     
+    return await run_idempotent(
+        request, db, user_id, progress_data,
+        lambda session: _record_progress(session, user_id, progress_data),
+        lambda event: broker.publish(user_id, "progress.updated", event),
+        UserProgressResponse
+    )
+
+def _record_progress(db: Session, user_id: int, progress_data: dict) -> Tuple[UserProgress, dict]:
     scenario_id = progress_data.get("scenario_id")
     completion_percentage = progress_data.get("completion_percentage")
     
     if scenario_id is None or completion_percentage is None:
         raise HTTPException(status_code=422, detail="scenario_id and completion_percentage are required")
     
+    graph = get_prerequisite_graph(db)
+    if scenario_id not in graph:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    missing = graph.missing(scenario_id, get_completed_scenario_ids(db, user_id))
+    if missing:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Prerequisite scenarios not completed: {missing}"
+        )
+    
     # Check if progress already exists
     existing_progress = db.query(UserProgress).filter(
         UserProgress.user_id == user_id,
@@ -323,14 +575,15 @@ async def update_user_progress(
     ).first()
     
     if existing_progress:
+        previous_percentage = existing_progress.completion_percentage
         existing_progress.completion_percentage = completion_percentage
         existing_progress.is_completed = completion_percentage >= 100
         existing_progress.last_accessed_at = datetime.utcnow()
         if completion_percentage >= 100 and not existing_progress.completed_at:
             existing_progress.completed_at = datetime.utcnow()
-        db.commit()
+        event = _progress_event(db, existing_progress, previous_percentage)
         db.refresh(existing_progress)
-        return existing_progress
+        return existing_progress, event
     else:
         new_progress = UserProgress(
             user_id=user_id,
@@ -341,9 +594,198 @@ async def update_user_progress(
             completed_at=datetime.utcnow() if completion_percentage >= 100 else None
         )
         db.add(new_progress)
-        db.commit()
+        event = _progress_event(db, new_progress, None)
         db.refresh(new_progress)
-        return new_progress
+        return new_progress, event
+
+def _progress_event(db: Session, progress: UserProgress, previous_percentage: Optional[float]) -> dict:
+    """Flush the change and queue its outbox message; returns the event payload."""
+    db.flush()
+    event = {
+        "progress_id": progress.id,
+        "scenario_id": progress.scenario_id,
+        "completion_percentage": progress.completion_percentage,
+        "is_completed": progress.is_completed
+    }
+    enqueue(db, "progress.updated", {
+        "user_id": progress.user_id,
+        "previous_percentage": previous_percentage,
+        **event
+    })
+    return event
+
+@app.get("/users/{user_id}/progress/events", response_model=List[ProgressEventResponse])
+async def get_user_progress_events(
+    user_id: int,
+    scenario_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """A user's learning trajectory from the progress event log."""
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this user's progress")
+    
+    query = db.query(ProgressEvent).filter(ProgressEvent.user_id == user_id)
+    if scenario_id is not None:
+        query = query.filter(ProgressEvent.scenario_id == scenario_id)
+    return query.order_by(ProgressEvent.ts).all()
+
+@app.get("/scenarios/{scenario_id}/progress/rollups", response_model=List[ProgressRollupResponse])
+async def get_scenario_progress_rollups(
+    scenario_id: int,
+    period: str = Query("day"),
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_read_db)
+):
+    """Daily or weekly progress activity, completions and time to completion."""
+    if period not in PERIODS:
+        raise HTTPException(status_code=422, detail=f"period must be one of {list(PERIODS)}")
+    return get_scenario_rollups(db, scenario_id, period, since)
+
+# AI guide
+@app.post("/guide/ask", response_model=GuideAnswer)
+async def ask_guide(
+    question: GuideQuestion,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Top matching passages from scenario and quiz content, served from a local index."""
+    index = get_guide_index(db)
+    top_k = min(max(question.top_k, 1), 20)
+    return {"passages": index.search(question.question, question.scenario_id, top_k)}
+
+# Delta sync
+@app.get("/sync", response_model=SyncResponse)
+async def sync_changes(
+    since: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Scenarios, quizzes, progress and attempts changed after the since cursor."""
+    return collect_changes(db, current_user.id, since)
+
+# Admin
+@app.post("/admin/users/import")
+async def import_users_endpoint(
+    request: Request,
+    format: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_admin)
+):
+    """Bulk-create users from a CSV or JSON body, streaming one NDJSON result per row.
+
+    Results arrive in completion order, not file order; each has the input "row" number.
+    """
+    if format is None:
+        format = "json" if "json" in request.headers.get("content-type", "") else "csv"
+    try:
+        rows = parse_rows(await request.body(), format)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import file: {e}")
+
+    def results():
+        # The import outlives the request's dependencies, so it owns its session
+        with SessionLocal() as db:
+            for result in import_users(db, rows):
+                yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+# Cross-user reports, computed from the analytics snapshot rather than the live database
+def _require_snapshot():
+    snapshot = get_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Analytics snapshot has not been built yet")
+    return snapshot
+
+@app.get("/reports/funnels", response_model=FunnelReport)
+async def get_completion_funnels(current_user: User = Depends(get_current_admin)):
+    """Learners per scenario at each completion stage."""
+    snapshot = _require_snapshot()
+    return {"snapshot_at": snapshot.built_at, "scenarios": completion_funnels(snapshot)}
+
+@app.get("/reports/scores", response_model=ScoreDistributionReport)
+async def get_score_distributions(
+    bins: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_admin)
+):
+    """Quiz score histograms by scenario difficulty level."""
+    snapshot = _require_snapshot()
+    return {"snapshot_at": snapshot.built_at, "difficulties": score_distributions(snapshot, bins)}
+
+@app.get("/reports/retention", response_model=RetentionReport)
+async def get_cohort_retention(
+    weeks: int = Query(8, ge=1, le=52),
+    cohorts: int = Query(12, ge=1, le=104),
+    current_user: User = Depends(get_current_admin)
+):
+    """Weekly login retention by first-login cohort."""
+    snapshot = _require_snapshot()
+    return {"snapshot_at": snapshot.built_at, "cohorts": cohort_retention(snapshot, weeks, cohorts)}
+
+# Live event stream
+@app.post("/users/{user_id}/events/token", response_model=EventStreamToken)
+async def create_event_stream_token(
+    user_id: int,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user)
+):
+    """A short-lived token for opening the event stream from a browser EventSource."""
+    if current_user.id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this user's events")
+    session_id = verify_token(credentials.credentials).get("jti")
+    token = create_access_token(
+        data={"sub": str(user_id), "scope": "events", "sid": session_id},
+        expires_delta=timedelta(seconds=EVENTS_TOKEN_SECONDS)
+    )
+    return {"token": token, "expires_in": EVENTS_TOKEN_SECONDS}
+
+@app.get("/users/{user_id}/events")
+async def stream_user_events(
+    user_id: int,
+    request: Request,
+    token: Optional[str] = Query(None),
+    last_event_id: Optional[int] = Query(None, ge=0),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Server-sent events for progress, quiz attempt and session changes.
+
+    Browsers pass a stream token from POST /users/{user_id}/events/token as
+    ?token=; other clients may use their bearer token. The stream closes when
+    the login session it was opened under is logged out.
+    """
+    if token is not None:
+        payload = verify_token(token)
+        if payload is None or payload.get("scope") != "events" or payload.get("sub") != str(user_id):
+            raise HTTPException(status_code=401, detail="Invalid or expired stream token")
+        session_id = payload.get("sid")
+        if session_id is not None:
+            with SessionLocal() as db:
+                revoked = is_revoked(session_id, db)
+            if revoked:
+                raise HTTPException(status_code=401, detail="Token has been revoked")
+    elif credentials is not None:
+        # Authenticate with a short-lived session so idle streams hold no DB connection
+        with SessionLocal() as db:
+            current_user = _authenticate(credentials.credentials, db)
+        if current_user.id != user_id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this user's events")
+        session_id = verify_token(credentials.credentials).get("jti")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Reconnecting EventSources send Last-Event-ID; manual reconnects pass ?last_event_id=
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        event_stream(user_id, last_event_id, session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Lightweight schema and data migrations.
+
+Base.metadata.create_all only creates missing tables, so columns added to
+existing models and data moved between tables are handled here. Every step is
+idempotent and safe to run on each startup.
+"""
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models import Base, Quiz
+from quiz_questions import build_question_rows
+from sync import backfill_change_seqs
+
+
+def add_missing_columns(engine: Engine):
+    """Add nullable columns that exist on the models but not in the database."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                )
+
+
+def create_missing_indexes(engine: Engine):
+    """Create model indexes missing from existing tables."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def migrate_quiz_questions(db: Session):
+    """Move questions out of Quiz JSON blobs into the questions table."""
+    quizzes = db.query(Quiz).filter(~Quiz.questions.any()).all()
+    for quiz in quizzes:
+        if quiz.legacy_questions:
+            quiz.questions = build_question_rows(quiz.legacy_questions)
+            quiz.legacy_questions = []
+    db.commit()
+
+
+def run_migrations(engine: Engine):
+    """Bring an existing database up to date with the models."""
+    add_missing_columns(engine)
+    create_missing_indexes(engine)
+    db = Session(engine)
+    try:
+        migrate_quiz_questions(db)
+        backfill_change_seqs(db)
+    finally:
+        db.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -36,7 +36,8 @@ class Scenario(Base):
     learning_objectives = Column(JSON, nullable=True)  # List of learning objectives
     prerequisites = Column(JSON, nullable=True)  # List of prerequisite scenario IDs
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    change_seq = Column(Integer, nullable=True, index=True)  # Sync sequence of the last change
     
     # Relationships
     quiz = relationship("Quiz", back_populates="scenario", uselist=False)
@@ -49,15 +50,41 @@ class Quiz(Base):
     scenario_id = Column(Integer, ForeignKey("scenarios.id"), nullable=False)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    questions = Column(JSON, nullable=False)  # List of question objects
+    # Legacy JSON blob of question objects; rows now live in the questions table
+    legacy_questions = Column("questions", JSON, nullable=False, default=list)
     passing_score = Column(Float, default=70.0)  # Minimum score to pass (percentage)
     time_limit_minutes = Column(Integer, nullable=True)  # Optional time limit
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    change_seq = Column(Integer, nullable=True, index=True)  # Sync sequence of the last change
     
     # Relationships
     scenario = relationship("Scenario", back_populates="quiz")
     attempts = relationship("QuizAttempt", back_populates="quiz")
+    questions = relationship(
+        "QuizQuestion",
+        back_populates="quiz",
+        order_by="QuizQuestion.position",
+        cascade="all, delete-orphan"
+    )
+
+class QuizQuestion(Base):
+    __tablename__ = "questions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    position = Column(Integer, nullable=False)  # 0-based order within the quiz
+    question_text = Column(Text, nullable=False)
+    options = Column(JSON, nullable=False)  # List of option strings
+    correct_answer = Column(Integer, nullable=False)  # Index of correct option
+    explanation = Column(Text, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_questions_quiz_position", "quiz_id", "position", unique=True),
+    )
+    
+    # Relationships
+    quiz = relationship("Quiz", back_populates="questions")
 
 class QuizAttempt(Base):
     __tablename__ = "quiz_attempts"
@@ -66,12 +93,14 @@ class QuizAttempt(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
     answers = Column(JSON, nullable=False)  # List of user's answers
+    question_ids = Column(JSON, nullable=True)  # Question ids answered, when a subset was served
     score = Column(Float, nullable=False)  # Calculated score (percentage)
     is_passed = Column(Boolean, default=False)  # Whether the attempt passed
     time_taken_minutes = Column(Float, nullable=True)  # Time taken to complete
     started_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    change_seq = Column(Integer, nullable=True, index=True)  # Sync sequence of the last change
     
     # Relationships
     user = relationship("User", back_populates="quiz_attempts")
@@ -82,7 +111,7 @@ class UserSession(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    session_token = Column(String, unique=True, index=True, nullable=False)
+    session_token = Column(String(32), unique=True, index=True, nullable=False)  # The token's jti, not the JWT
     login_time = Column(DateTime, default=datetime.utcnow)
     last_activity = Column(DateTime, default=datetime.utcnow)
     logout_time = Column(DateTime, nullable=True)
@@ -91,9 +120,25 @@ class UserSession(Base):
     user_agent = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        Index("ix_user_sessions_user_active", "user_id", "is_active"),
+        Index("ix_user_sessions_active_login", "is_active", "login_time"),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="sessions")
 
+class UserSessionArchive(Base):
+    __tablename__ = "user_sessions_archive"
+    
+    # Compact copy of ended sessions: no token, agent or bookkeeping columns
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, nullable=False, index=True)  # Original user_sessions.id; SQLite may reuse it
+    user_id = Column(Integer, nullable=False, index=True)
+    login_time = Column(DateTime, nullable=False, index=True)
+    logout_time = Column(DateTime, nullable=True)
+    ip_address = Column(String, nullable=True)
+
 class UserProgress(Base):
     __tablename__ = "user_progress"
     
@@ -105,8 +150,131 @@ class UserProgress(Base):
     last_accessed_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    change_seq = Column(Integer, nullable=True, index=True)  # Sync sequence of the last change
     
     # Relationships
     user = relationship("User", back_populates="progress")
-    scenario = relationship("Scenario", back_populates="progress")
\ No newline at end of file
+    scenario = relationship("Scenario", back_populates="progress")
+
+class QuestionStat(Base):
+    __tablename__ = "question_stats"
+    
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False, index=True)
+    responses = Column(Integer, default=0)  # Attempts that answered the question
+    correct = Column(Integer, default=0)  # Attempts that answered it correctly
+    # Running sums of the attempt score (fraction correct) for point-biserial
+    sum_score = Column(Float, default=0.0)
+    sum_score_sq = Column(Float, default=0.0)
+    sum_correct_score = Column(Float, default=0.0)
+    option_counts = Column(JSON, nullable=True)  # Selections per option index
+    difficulty = Column(Float, nullable=True)  # p-value: proportion answering correctly
+    discrimination = Column(Float, nullable=True)  # Point-biserial correlation with score
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AnalyticsWatermark(Base):
+    __tablename__ = "analytics_watermarks"
+    
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    last_attempt_id = Column(Integer, default=0)  # Highest QuizAttempt.id already folded in
+    attempts_processed = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    idempotency_key = Column(String, nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of method, path and body
+    status_code = Column(Integer, nullable=True)  # None while the first request is in flight
+    response_body = Column(Text, nullable=True)  # Serialized JSON response
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        Index("ix_idempotency_keys_user_key", "user_id", "idempotency_key", unique=True),
+    )
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+    
+    id = Column(Integer, primary_key=True)  # Single row with id 1
+    last_seq = Column(Integer, nullable=False, default=0)
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    change_seq = Column(Integer, nullable=False, index=True)
+    entity = Column(String, nullable=False)  # scenario, quiz, progress, quiz_attempt
+    entity_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)  # Owner for user-scoped entities
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String, nullable=False)  # e.g. session.login, quiz_attempt.submitted
+    payload = Column(JSON, nullable=False)
+    status = Column(String, default="pending")  # pending, done, dead
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    available_at = Column(DateTime, default=datetime.utcnow)  # Not picked up before this time
+    claim = Column(String(32), nullable=True)  # Token of the worker holding the current lease
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_outbox_status_available", "status", "available_at"),
+    )
+
+class AuditLog(Base):
+    __tablename__ = "audit_log"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, unique=True, nullable=False)  # Outbox message; redelivery is a no-op
+    topic = Column(String, nullable=False)
+    user_id = Column(Integer, nullable=True, index=True)
+    payload = Column(JSON, nullable=False)
+    occurred_at = Column(DateTime, nullable=False, index=True)  # When the change committed
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ProgressEvent(Base):
+    __tablename__ = "progress_events"
+    
+    # Append-only and deliberately narrow: one row per completion change
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    scenario_id = Column(Integer, nullable=False)
+    pct = Column(Float, nullable=False)
+    ts = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_progress_events_user_scenario_ts", "user_id", "scenario_id", "ts"),
+        Index("ix_progress_events_ts", "ts"),
+    )
+
+class ProgressRollup(Base):
+    __tablename__ = "progress_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scenario_id = Column(Integer, nullable=False)
+    period = Column(String, nullable=False)  # day, week
+    bucket_start = Column(DateTime, nullable=False)  # Midnight of the day, or Monday of the week
+    events = Column(Integer, default=0)
+    sum_pct = Column(Float, default=0.0)
+    completions = Column(Integer, default=0)
+    sum_completion_minutes = Column(Float, default=0.0)  # Time from first progress to completion
+    
+    __table_args__ = (
+        Index("ix_progress_rollups_bucket", "scenario_id", "period", "bucket_start", unique=True),
+    )
+
+class ProgressRollupState(Base):
+    __tablename__ = "progress_rollup_state"
+    
+    id = Column(Integer, primary_key=True)  # Single row with id 1
+    last_event_id = Column(Integer, nullable=False, default=0)  # Highest ProgressEvent.id rolled up
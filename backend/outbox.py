@@ -0,0 +1,165 @@
+"""
+Transactional outbox for post-commit side effects.
+
+Handlers call enqueue() inside the same transaction as their main change, so
+a message exists if and only if the change committed. A background worker
+claims pending messages in batches, runs the registered handlers and marks
+them done. Failures are retried with exponential backoff until
+OUTBOX_MAX_ATTEMPTS, after which the message is marked dead. Delivery is
+at-least-once: a crash after a handler ran but before the batch committed
+re-delivers the message, so handlers must be idempotent.
+"""
+
+import asyncio
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import (
+    OUTBOX_POLL_SECONDS, OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_BACKOFF_SECONDS,
+    OUTBOX_LEASE_SECONDS, OUTBOX_RETENTION_DAYS
+)
+from models import AuditLog, OutboxMessage
+
+PENDING = "pending"
+DONE = "done"
+DEAD = "dead"
+
+_handlers: Dict[str, List[Callable[[Session, OutboxMessage], None]]] = defaultdict(list)
+
+
+def handles(topic: str):
+    """Register a handler for a topic; it receives a session and the message."""
+    def register(handler):
+        _handlers[topic].append(handler)
+        return handler
+    return register
+
+
+def enqueue(db: Session, topic: str, payload: dict) -> OutboxMessage:
+    """Add a message to the current transaction; it is delivered after commit."""
+    message = OutboxMessage(topic=topic, payload=payload)
+    db.add(message)
+    return message
+
+
+def _claim_batch(db: Session, now: datetime, batch_size: int) -> List[OutboxMessage]:
+    """Lease a batch of due messages and return the ones this worker got.
+
+    Two workers can select the same ids, but the lease only stamps messages
+    that are still due, so whichever commits first takes them and the other
+    finds none carrying its claim token.
+    """
+    ids = db.execute(
+        select(OutboxMessage.id).where(
+            OutboxMessage.status == PENDING,
+            OutboxMessage.available_at <= now
+        ).order_by(OutboxMessage.id).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return []
+    claim = uuid.uuid4().hex
+    db.execute(
+        update(OutboxMessage).where(
+            OutboxMessage.id.in_(ids),
+            OutboxMessage.status == PENDING,
+            OutboxMessage.available_at <= now
+        ).values(available_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS), claim=claim)
+    )
+    db.commit()
+    return db.query(OutboxMessage).filter(
+        OutboxMessage.claim == claim,
+        OutboxMessage.status == PENDING
+    ).order_by(OutboxMessage.id).all()
+
+
+def process_batch(engine: Engine, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Deliver one batch of due messages; returns how many were claimed."""
+    db = Session(engine)
+    try:
+        now = datetime.utcnow()
+        messages = _claim_batch(db, now, batch_size)
+        if not messages:
+            return 0
+        for message in messages:
+            try:
+                with db.begin_nested():
+                    for handler in _handlers.get(message.topic, ()):
+                        handler(db, message)
+            except Exception as e:
+                message.attempts += 1
+                message.last_error = f"{type(e).__name__}: {e}"
+                if message.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    message.status = DEAD
+                else:
+                    delay = OUTBOX_BACKOFF_SECONDS * 2 ** (message.attempts - 1)
+                    message.available_at = datetime.utcnow() + timedelta(seconds=delay)
+            else:
+                message.status = DONE
+                message.processed_at = datetime.utcnow()
+        db.commit()
+        return len(messages)
+    finally:
+        db.close()
+
+
+async def outbox_worker(engine: Engine, poll_seconds: float = OUTBOX_POLL_SECONDS):
+    """Drain the outbox forever; full batches are followed immediately by the next."""
+    while True:
+        try:
+            claimed = await run_in_threadpool(process_batch, engine)
+        except Exception as e:
+            print(f"Outbox worker failed: {e}")
+            claimed = 0
+        if claimed < OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(poll_seconds)
+
+
+def outbox_metrics(db: Session) -> dict:
+    """Queue depth and lag (age of the oldest undelivered message)."""
+    pending, oldest = db.execute(
+        select(func.count(OutboxMessage.id), func.min(OutboxMessage.created_at)).where(
+            OutboxMessage.status == PENDING
+        )
+    ).one()
+    dead = db.execute(
+        select(func.count(OutboxMessage.id)).where(OutboxMessage.status == DEAD)
+    ).scalar_one()
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    return {"pending": pending, "dead": dead, "lag_seconds": lag}
+
+
+def purge_delivered(db: Session) -> int:
+    """Delete delivered messages older than the retention window."""
+    cutoff = datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+    deleted = db.execute(
+        delete(OutboxMessage).where(
+            OutboxMessage.status == DONE,
+            OutboxMessage.processed_at < cutoff
+        )
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+@handles("session.login")
+@handles("session.logout")
+@handles("quiz_attempt.submitted")
+@handles("progress.updated")
+def audit(db: Session, message: OutboxMessage):
+    """Record user-visible state changes in the audit log, once per message."""
+    if db.query(AuditLog.id).filter(AuditLog.message_id == message.id).first():
+        return
+    db.add(AuditLog(
+        message_id=message.id,
+        topic=message.topic,
+        user_id=message.payload.get("user_id"),
+        payload=message.payload,
+        occurred_at=message.created_at
+    ))
@@ -0,0 +1,122 @@
+"""
+Server-side prerequisite graph for scenarios.
+
+Scenario.prerequisites holds a list of scenario IDs that must be completed
+before a scenario can be started. The graph is built from the catalog, cached
+in-process under the catalog version and rebuilt from the primary whenever
+that version changes, whichever worker made the change.
+"""
+
+from collections import deque
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from database import primary_session
+from models import Scenario, UserProgress
+from sync import catalog_version
+
+LOCKED = "locked"
+UNLOCKED = "unlocked"
+COMPLETED = "completed"
+
+
+class PrerequisiteGraph:
+    """Immutable prerequisite DAG with a precomputed topological order."""
+
+    def __init__(self, prerequisites: Dict[int, Iterable[int]], version: Optional[str] = None):
+        self.version = version
+        self.prerequisites: Dict[int, tuple] = {
+            scenario_id: tuple(sorted(set(required or [])))
+            for scenario_id, required in prerequisites.items()
+        }
+        self.order, self.cyclic = self._topological_order()
+
+    def _topological_order(self):
+        """Kahn's algorithm; scenarios left over are part of a cycle."""
+        indegree = {scenario_id: 0 for scenario_id in self.prerequisites}
+        dependants: Dict[int, List[int]] = {scenario_id: [] for scenario_id in self.prerequisites}
+        for scenario_id, required in self.prerequisites.items():
+            for prerequisite_id in required:
+                if prerequisite_id in dependants:
+                    dependants[prerequisite_id].append(scenario_id)
+                    indegree[scenario_id] += 1
+
+        queue = deque(sorted(s for s, degree in indegree.items() if degree == 0))
+        order = []
+        while queue:
+            scenario_id = queue.popleft()
+            order.append(scenario_id)
+            for dependant_id in dependants[scenario_id]:
+                indegree[dependant_id] -= 1
+                if indegree[dependant_id] == 0:
+                    queue.append(dependant_id)
+
+        cyclic = set(self.prerequisites) - set(order)
+        return order + sorted(cyclic), cyclic
+
+    def __contains__(self, scenario_id: int) -> bool:
+        return scenario_id in self.prerequisites
+
+    def missing(self, scenario_id: int, completed: Set[int]) -> List[int]:
+        """Prerequisites of a scenario that are not in the completed set."""
+        return [p for p in self.prerequisites.get(scenario_id, ()) if p not in completed]
+
+    def availability(self, completed: Set[int]) -> List[dict]:
+        """Compute locked/unlocked/completed status for every scenario in one pass."""
+        result = []
+        for scenario_id in self.order:
+            missing = self.missing(scenario_id, completed)
+            if scenario_id in completed:
+                state = COMPLETED
+            elif missing or scenario_id in self.cyclic:
+                state = LOCKED
+            else:
+                state = UNLOCKED
+            result.append({
+                "scenario_id": scenario_id,
+                "status": state,
+                "missing_prerequisites": missing,
+            })
+        return result
+
+
+_graph: Optional[PrerequisiteGraph] = None
+_graph_lock = Lock()
+
+
+def build_prerequisite_graph(db: Session, version: Optional[str] = None) -> PrerequisiteGraph:
+    """Build a fresh graph from the scenario catalog."""
+    rows = db.query(Scenario.id, Scenario.prerequisites).all()
+    return PrerequisiteGraph({scenario_id: required for scenario_id, required in rows}, version)
+
+
+def get_prerequisite_graph(db: Session) -> PrerequisiteGraph:
+    """Return the graph for the current catalog version, building it when it changed."""
+    global _graph
+    with primary_session(db) as primary:
+        version = catalog_version(primary)
+        graph = _graph
+        if graph is None or graph.version != version:
+            with _graph_lock:
+                if _graph is None or _graph.version != version:
+                    _graph = build_prerequisite_graph(primary, version)
+                graph = _graph
+    return graph
+
+
+def invalidate_prerequisite_graph():
+    """Drop the cached graph early; the next request rebuilds it."""
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+def get_completed_scenario_ids(db: Session, user_id: int) -> Set[int]:
+    """IDs of all scenarios the user has completed."""
+    rows = db.query(UserProgress.scenario_id).filter(
+        UserProgress.user_id == user_id,
+        UserProgress.is_completed == True
+    ).all()
+    return {scenario_id for (scenario_id,) in rows}
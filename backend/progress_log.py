@@ -0,0 +1,201 @@
+"""
+Append-only progress event log with daily and weekly rollups.
+
+Progress changes reach the log through the outbox: the outbox worker appends
+one narrow row per completion change, so events are written in the worker's
+batch transactions rather than on the request path. A periodic job folds new
+events (past a high-water mark) into per-scenario daily and weekly rollups,
+holding the write lock and the high-water mark row for each batch so workers
+running the job at the same time never fold an event twice, and raw events older than the horizon are downsampled to the last event per
+user, scenario and day so storage stays bounded.
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, delete, func, insert, select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import (
+    PROGRESS_ROLLUP_INTERVAL_SECONDS, PROGRESS_ROLLUP_BATCH_SIZE, PROGRESS_EVENT_HORIZON_DAYS
+)
+from database import begin_write
+from models import OutboxMessage, ProgressEvent, ProgressRollup, ProgressRollupState, UserProgress
+from outbox import handles
+
+PERIODS = ("day", "week")
+
+
+@handles("progress.updated")
+def append_progress_event(db: Session, message: OutboxMessage):
+    """Append a log row when the completion percentage actually changed."""
+    payload = message.payload
+    if payload.get("previous_percentage") == payload["completion_percentage"]:
+        return
+    db.execute(insert(ProgressEvent).values(
+        user_id=payload["user_id"],
+        scenario_id=payload["scenario_id"],
+        pct=payload["completion_percentage"],
+        ts=message.created_at
+    ))
+
+
+def bucket_start(ts: datetime, period: str) -> datetime:
+    day = datetime(ts.year, ts.month, ts.day)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _fold(
+    totals: Dict[Tuple[int, str, datetime], List[float]],
+    events: List[tuple],
+    first_seen: Dict[Tuple[int, int], datetime]
+):
+    for _, user_id, scenario_id, pct, ts in events:
+        completion_minutes = None
+        if pct >= 100:
+            started = first_seen.get((user_id, scenario_id))
+            if started is not None:
+                completion_minutes = max((ts - started).total_seconds() / 60, 0.0)
+        for period in PERIODS:
+            bucket = totals[(scenario_id, period, bucket_start(ts, period))]
+            bucket[0] += 1
+            bucket[1] += pct
+            if pct >= 100:
+                bucket[2] += 1
+                bucket[3] += completion_minutes or 0.0
+
+
+def _lock_state(db: Session) -> ProgressRollupState:
+    """The high-water mark row, created if missing and locked for this transaction."""
+    db.commit()  # The lock has to be taken at the start of a transaction
+    if db.query(ProgressRollupState.id).filter(ProgressRollupState.id == 1).first() is None:
+        try:
+            db.add(ProgressRollupState(id=1, last_event_id=0))
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # A concurrent refresh created it first
+    begin_write(db)
+    return db.query(ProgressRollupState).filter(
+        ProgressRollupState.id == 1
+    ).with_for_update().populate_existing().one()
+
+
+def refresh_rollups(db: Session, batch_size: int = PROGRESS_ROLLUP_BATCH_SIZE) -> int:
+    """Fold events past the high-water mark into rollups; returns events processed."""
+    processed = 0
+    while True:
+        state = _lock_state(db)
+        events = db.execute(
+            select(
+                ProgressEvent.id, ProgressEvent.user_id, ProgressEvent.scenario_id,
+                ProgressEvent.pct, ProgressEvent.ts
+            ).where(ProgressEvent.id > state.last_event_id).order_by(ProgressEvent.id).limit(batch_size)
+        ).all()
+        if not events:
+            break
+
+        # Time to completion is measured from when the user first recorded progress
+        completed_pairs = {(e.user_id, e.scenario_id) for e in events if e.pct >= 100}
+        first_seen = {}
+        if completed_pairs:
+            rows = db.execute(
+                select(UserProgress.user_id, UserProgress.scenario_id, UserProgress.created_at).where(
+                    tuple_(UserProgress.user_id, UserProgress.scenario_id).in_(list(completed_pairs))
+                )
+            ).all()
+            first_seen = {(user_id, scenario_id): created for user_id, scenario_id, created in rows}
+
+        totals: Dict[Tuple[int, str, datetime], List[float]] = defaultdict(lambda: [0, 0.0, 0, 0.0])
+        _fold(totals, events, first_seen)
+
+        existing = {
+            (rollup.scenario_id, rollup.period, rollup.bucket_start): rollup
+            for rollup in db.query(ProgressRollup).populate_existing().filter(
+                tuple_(ProgressRollup.scenario_id, ProgressRollup.period, ProgressRollup.bucket_start).in_(
+                    list(totals)
+                )
+            )
+        }
+        for key, (count, sum_pct, completions, sum_minutes) in totals.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                scenario_id, period, start = key
+                rollup = ProgressRollup(
+                    scenario_id=scenario_id, period=period, bucket_start=start,
+                    events=0, sum_pct=0.0, completions=0, sum_completion_minutes=0.0
+                )
+                db.add(rollup)
+            rollup.events += count
+            rollup.sum_pct += sum_pct
+            rollup.completions += completions
+            rollup.sum_completion_minutes += sum_minutes
+
+        state.last_event_id = events[-1].id
+        db.commit()
+        processed += len(events)
+    db.commit()
+    return processed
+
+
+def downsample_events(db: Session, horizon_days: int = PROGRESS_EVENT_HORIZON_DAYS) -> int:
+    """Keep only the last event per user, scenario and day beyond the horizon."""
+    state = db.get(ProgressRollupState, 1)
+    if state is None:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=horizon_days)
+    old = and_(ProgressEvent.ts < cutoff, ProgressEvent.id <= state.last_event_id)
+    keep = select(func.max(ProgressEvent.id)).where(old).group_by(
+        ProgressEvent.user_id, ProgressEvent.scenario_id, func.date(ProgressEvent.ts)
+    )
+    deleted = db.execute(delete(ProgressEvent).where(old, ProgressEvent.id.not_in(keep))).rowcount
+    db.commit()
+    return deleted
+
+
+def run_rollups(engine: Engine) -> dict:
+    db = Session(engine)
+    try:
+        return {"rolled_up": refresh_rollups(db), "downsampled": downsample_events(db)}
+    finally:
+        db.close()
+
+
+async def rollup_loop(engine: Engine, interval_seconds: float = PROGRESS_ROLLUP_INTERVAL_SECONDS):
+    """Refresh rollups and downsample old events forever."""
+    while True:
+        try:
+            await run_in_threadpool(run_rollups, engine)
+        except Exception as e:
+            print(f"Progress rollup failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+def get_scenario_rollups(
+    db: Session, scenario_id: int, period: str, since: Optional[datetime] = None
+) -> List[dict]:
+    """Rollup buckets for a scenario in the ProgressRollupResponse shape."""
+    query = db.query(ProgressRollup).filter(
+        ProgressRollup.scenario_id == scenario_id,
+        ProgressRollup.period == period
+    )
+    if since is not None:
+        query = query.filter(ProgressRollup.bucket_start >= bucket_start(since, period))
+    return [
+        {
+            "bucket_start": rollup.bucket_start,
+            "events": rollup.events,
+            "completions": rollup.completions,
+            "average_completion_percentage": rollup.sum_pct / rollup.events if rollup.events else 0.0,
+            "average_minutes_to_complete": (
+                rollup.sum_completion_minutes / rollup.completions if rollup.completions else None
+            ),
+        }
+        for rollup in query.order_by(ProgressRollup.bucket_start)
+    ]
@@ -0,0 +1,221 @@
+"""
+Quiz delivery cache: pre-encoded client payloads and server-side answer keys.
+
+For each quiz the cache keeps the response header and every question as
+ready-made JSON bytes with correct_answer and explanation stripped, so
+serving a quiz (or a page or sample of it) is a dict lookup and a bytes join;
+the full quiz is also kept precompressed.
+Next to the payload sits the answer key as a small NumPy array, used to grade
+attempts without reading the quiz from the database, and the explanations
+used for per-question feedback once a learner has answered.
+
+Attempts are always graded against the full quiz, unanswered questions
+counting as wrong, unless they come with the sample token issued alongside a
+random sample; then they are graded against exactly that sample. The token is
+signed, so a client cannot choose which questions it is graded on.
+
+Entries are built from the primary on first use and kept under the catalog
+version, which is checked on the primary on every lookup; when it moves, for
+a quiz created or changed through any worker, every entry is dropped.
+invalidate_quiz_deliveries() only drops them early.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+
+from auth import SECRET_KEY, ALGORITHM
+from compression import PrecompressedBody
+from config import QUIZ_SAMPLE_TOKEN_HOURS
+from database import primary_session
+from models import Quiz, QuizQuestion
+from sync import catalog_version
+
+
+def _encode(value) -> bytes:
+    return json.dumps(jsonable_encoder(value), separators=(",", ":")).encode("utf-8")
+
+
+class QuizDelivery:
+    """Everything needed to serve and grade one version of a quiz."""
+
+    def __init__(self, quiz: Quiz, rows: List[QuizQuestion]):
+        self.quiz_id = quiz.id
+        self.scenario_id = quiz.scenario_id
+        self.passing_score = quiz.passing_score
+        self.answer_key = np.array([row.correct_answer for row in rows], dtype=np.int64)
+        self.option_counts = np.array([len(row.options) for row in rows], dtype=np.int64)
+        self.explanations = [row.explanation for row in rows]
+
+        header = _encode({
+            "id": quiz.id,
+            "scenario_id": quiz.scenario_id,
+            "title": quiz.title,
+            "description": quiz.description,
+            "passing_score": quiz.passing_score,
+            "time_limit_minutes": quiz.time_limit_minutes,
+            "created_at": quiz.created_at,
+            "updated_at": quiz.updated_at,
+        })
+        self._head = header[:-1] + b',"questions":['
+        self._tail = b'],"total_questions":%d}' % len(rows)
+        self._questions = [
+            _encode({"id": row.position + 1, "question_text": row.question_text, "options": row.options})
+            for row in rows
+        ]
+        self.full_body = PrecompressedBody(self.payload(range(len(rows))))
+
+    @property
+    def total_questions(self) -> int:
+        return len(self._questions)
+
+    def payload(self, positions: Sequence[int]) -> bytes:
+        """Response bytes for the questions at the given positions."""
+        return self._head + b",".join(self._questions[p] for p in positions) + self._tail
+
+    def select(self, offset: int = 0, limit: Optional[int] = None, sample: Optional[int] = None) -> bytes:
+        """An ordered page or a signed random sample of the questions, as response bytes."""
+        if offset == 0 and limit is None and sample is None:
+            return self.full_body.body
+        if sample is not None:
+            positions = sorted(random.sample(range(self.total_questions), min(sample, self.total_questions)))
+            token = self.sample_token([p + 1 for p in positions])
+            return self.payload(positions)[:-1] + b',"sample_token":%s}' % _encode(token)
+        end = self.total_questions if limit is None else offset + limit
+        positions = range(min(offset, self.total_questions), min(end, self.total_questions))
+        return self.payload(positions)
+
+    def sample_token(self, question_ids: List[int]) -> str:
+        """Signed record of the question ids issued in a sample."""
+        expire = datetime.utcnow() + timedelta(hours=QUIZ_SAMPLE_TOKEN_HOURS)
+        return jwt.encode({"quiz": self.quiz_id, "qids": question_ids, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+    def sample_positions(self, token: str) -> np.ndarray:
+        """0-based positions of the sample a token was issued for.
+
+        Raises ValueError if the token is invalid, expired or for another quiz.
+        """
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise ValueError("Invalid or expired sample token")
+        if claims.get("quiz") != self.quiz_id:
+            raise ValueError("Sample token is for a different quiz")
+        return self.positions_for(claims.get("qids") or [])
+
+    def graded_positions(self, sample_token: Optional[str]) -> np.ndarray:
+        """Positions an attempt is graded on: the issued sample, else the whole quiz."""
+        if sample_token is None:
+            return np.arange(self.total_questions)
+        return self.sample_positions(sample_token)
+
+    def positions_for(self, question_ids: Optional[List[int]], answer_count: Optional[int] = None) -> np.ndarray:
+        """0-based positions for client question ids.
+
+        Without ids, answers are taken to be in quiz order from the first
+        question. Raises ValueError for an empty list, a repeated id, an id
+        that is not in this quiz or more answers than questions.
+        """
+        if question_ids is None:
+            count = self.total_questions if answer_count is None else answer_count
+            if count > self.total_questions:
+                raise ValueError("More answers than questions in this quiz")
+            return np.arange(count)
+        if not question_ids:
+            raise ValueError("question_ids must not be empty")
+        if len(set(question_ids)) != len(question_ids):
+            raise ValueError("question_ids must not repeat a question")
+        positions = np.asarray(question_ids, dtype=np.int64) - 1
+        if positions.min() < 0 or positions.max() >= self.total_questions:
+            raise ValueError("Unknown question id for this quiz")
+        return positions
+
+    def grade(self, positions: np.ndarray, answers: List[int], graded: np.ndarray) -> Tuple[int, int]:
+        """(correct answers, questions graded) over the graded positions.
+
+        answers are given in positions order; graded questions without an
+        answer count as wrong. Raises ValueError for answers to questions
+        outside the graded set or that are not one of the question's options.
+        """
+        if len(answers) != len(positions):
+            raise ValueError("question_ids and answers must have the same length")
+        if not np.isin(positions, graded).all():
+            raise ValueError("Answered a question that is not part of this quiz or sample")
+        for position, answer in zip(positions.tolist(), answers):
+            if not 0 <= answer < self.option_counts[position]:
+                raise ValueError(f"Answer {answer} is not an option of question {position + 1}")
+        given = np.asarray(answers, dtype=np.int64)
+        correct = int(np.count_nonzero(self.answer_key[positions] == given))
+        return correct, len(graded)
+
+
+_deliveries: Dict[int, QuizDelivery] = {}
+_scenario_quizzes: Dict[int, Optional[int]] = {}
+_version: Optional[str] = None  # Catalog version the entries were built for
+_lock = Lock()
+
+
+def _current_version(primary: Session) -> str:
+    """The catalog version, dropping every entry built for another one."""
+    global _version
+    version = catalog_version(primary)
+    if version != _version:
+        with _lock:
+            if version != _version:
+                _deliveries.clear()
+                _scenario_quizzes.clear()
+                _version = version
+    return version
+
+
+def _build(db: Session, quiz: Quiz, version: str) -> QuizDelivery:
+    rows = db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz.id).order_by(QuizQuestion.position).all()
+    delivery = QuizDelivery(quiz, rows)
+    with _lock:
+        if version == _version:
+            _deliveries[quiz.id] = delivery
+    return delivery
+
+
+def _quiz_delivery(primary: Session, quiz_id: int, version: str) -> Optional[QuizDelivery]:
+    delivery = _deliveries.get(quiz_id)
+    if delivery is not None:
+        return delivery
+    quiz = primary.query(Quiz).filter(Quiz.id == quiz_id).first()
+    return _build(primary, quiz, version) if quiz else None
+
+
+def get_quiz_delivery(db: Session, quiz_id: int) -> Optional[QuizDelivery]:
+    """The cached delivery for a quiz, building it on first use; None if it does not exist."""
+    with primary_session(db) as primary:
+        return _quiz_delivery(primary, quiz_id, _current_version(primary))
+
+
+def get_scenario_quiz_delivery(db: Session, scenario_id: int) -> Optional[QuizDelivery]:
+    """The cached delivery for a scenario's quiz; None if the scenario has no quiz."""
+    with primary_session(db) as primary:
+        version = _current_version(primary)
+        if scenario_id in _scenario_quizzes:
+            quiz_id = _scenario_quizzes[scenario_id]
+            return None if quiz_id is None else _quiz_delivery(primary, quiz_id, version)
+        quiz = primary.query(Quiz).filter(Quiz.scenario_id == scenario_id).first()
+        with _lock:
+            if version == _version:
+                _scenario_quizzes[scenario_id] = quiz.id if quiz else None
+        if quiz is None:
+            return None
+        return _deliveries.get(quiz.id) or _build(primary, quiz, version)
+
+
+def invalidate_quiz_deliveries():
+    """Drop every cached delivery early; the next request rebuilds what it needs."""
+    with _lock:
+        _deliveries.clear()
+        _scenario_quizzes.clear()
@@ -0,0 +1,59 @@
+"""
+Helpers for the normalized questions table.
+
+Question ids exposed to clients are 1-based positions within their quiz, which
+matches the ids the legacy JSON blobs used.
+"""
+
+from typing import Iterable, List
+
+from models import Quiz, QuizQuestion
+
+
+def build_question_rows(questions: Iterable) -> List[QuizQuestion]:
+    """Turn question dicts or schema objects into ordered QuizQuestion rows."""
+    rows = []
+    for position, question in enumerate(questions):
+        if not isinstance(question, dict):
+            question = question.dict()
+        rows.append(QuizQuestion(
+            position=position,
+            question_text=question["question_text"],
+            options=question["options"],
+            correct_answer=question["correct_answer"],
+            explanation=question.get("explanation")
+        ))
+    return rows
+
+
+def question_to_dict(row: QuizQuestion, include_answers: bool = True) -> dict:
+    """Serialize a question row into the Question shape, or DeliveredQuestion without answers."""
+    question = {
+        "id": row.position + 1,
+        "question_text": row.question_text,
+        "options": row.options,
+    }
+    if include_answers:
+        question["correct_answer"] = row.correct_answer
+        question["explanation"] = row.explanation
+    return question
+
+
+def quiz_to_dict(quiz: Quiz, rows: List[QuizQuestion], total_questions: int, include_answers: bool = True) -> dict:
+    """Build a QuizResponse payload from a quiz and a subset of its rows.
+
+    With include_answers=False it is a QuizDeliveryResponse, the shape every
+    learner-facing read uses.
+    """
+    return {
+        "id": quiz.id,
+        "scenario_id": quiz.scenario_id,
+        "title": quiz.title,
+        "description": quiz.description,
+        "questions": [question_to_dict(row, include_answers) for row in rows],
+        "total_questions": total_questions,
+        "passing_score": quiz.passing_score,
+        "time_limit_minutes": quiz.time_limit_minutes,
+        "created_at": quiz.created_at,
+        "updated_at": quiz.updated_at,
+    }
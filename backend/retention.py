@@ -0,0 +1,142 @@
+"""
+Retention and compaction for user_sessions.
+
+Sessions still marked active after their token has expired are closed, ended
+sessions older than the archive window are moved in chunks to the compact
+user_sessions_archive table, and archived rows past the retention window are
+dropped, along with expired idempotency keys and delivered outbox
+messages. Each chunk is its own short transaction so writers are never blocked
+for long. Runs as a background task from the API or via run_retention.py.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, SESSION_ARCHIVE_AFTER_DAYS, SESSION_ARCHIVE_RETENTION_DAYS,
+    RETENTION_CHUNK_SIZE, RETENTION_INTERVAL_MINUTES
+)
+from idempotency import purge_expired_keys
+from outbox import purge_delivered
+from models import UserSession, UserSessionArchive
+
+
+def expire_stale_sessions(db: Session, now: datetime, chunk_size: int = RETENTION_CHUNK_SIZE) -> int:
+    """Close active sessions whose token lifetime has passed.
+
+    The session ended when its token expired, so that is its logout time, not
+    the time this pass happened to run.
+    """
+    lifetime = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    cutoff = now - lifetime
+    total = 0
+    while True:
+        rows = db.execute(
+            select(UserSession.id, UserSession.login_time).where(
+                UserSession.is_active == True,
+                UserSession.login_time < cutoff
+            ).limit(chunk_size)
+        ).all()
+        if not rows:
+            return total
+        db.execute(
+            update(UserSession),
+            [
+                {"id": session_id, "is_active": False, "logout_time": login_time + lifetime}
+                for session_id, login_time in rows
+            ]
+        )
+        db.commit()
+        total += len(rows)
+
+
+def archive_sessions(db: Session, now: datetime, chunk_size: int = RETENTION_CHUNK_SIZE) -> int:
+    """Move ended sessions older than the archive window to the archive table."""
+    cutoff = now - timedelta(days=SESSION_ARCHIVE_AFTER_DAYS)
+    total = 0
+    while True:
+        ids = db.execute(
+            select(UserSession.id).where(
+                UserSession.is_active == False,
+                UserSession.login_time < cutoff
+            ).order_by(UserSession.id).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return total
+        db.execute(
+            insert(UserSessionArchive).from_select(
+                ["session_id", "user_id", "login_time", "logout_time", "ip_address"],
+                select(
+                    UserSession.id, UserSession.user_id, UserSession.login_time,
+                    UserSession.logout_time, UserSession.ip_address
+                ).where(UserSession.id.in_(ids))
+            )
+        )
+        db.execute(delete(UserSession).where(UserSession.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+
+
+def purge_archive(db: Session, now: datetime, chunk_size: int = RETENTION_CHUNK_SIZE) -> int:
+    """Drop archived sessions older than the retention window."""
+    cutoff = now - timedelta(days=SESSION_ARCHIVE_RETENTION_DAYS)
+    total = 0
+    while True:
+        ids = db.execute(
+            select(UserSessionArchive.id).where(
+                UserSessionArchive.login_time < cutoff
+            ).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return total
+        db.execute(delete(UserSessionArchive).where(UserSessionArchive.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+
+
+def compact(engine: Engine, vacuum: bool = False):
+    """Refresh planner statistics and optionally reclaim free pages.
+
+    VACUUM rewrites the whole file under an exclusive lock, so the background
+    task only runs ANALYZE and leaves VACUUM to the CLI.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("ANALYZE")
+        if vacuum:
+            conn.exec_driver_sql("VACUUM")
+
+
+def run_retention(engine: Engine, vacuum: bool = False) -> dict:
+    """Run one full retention pass and return row counts per step."""
+    now = datetime.utcnow()
+    db = Session(engine)
+    try:
+        stats = {
+            "expired": expire_stale_sessions(db, now),
+            "archived": archive_sessions(db, now),
+            "purged": purge_archive(db, now),
+            "idempotency_keys": purge_expired_keys(db),
+            "outbox_messages": purge_delivered(db),
+        }
+    finally:
+        db.close()
+    if any(stats.values()) or vacuum:
+        compact(engine, vacuum=vacuum)
+    return stats
+
+
+async def retention_loop(engine: Engine, interval_minutes: int = RETENTION_INTERVAL_MINUTES):
+    """Run retention passes forever; meant to be started as a background task."""
+    while True:
+        try:
+            await run_in_threadpool(run_retention, engine)
+        except Exception as e:
+            print(f"Session retention failed: {e}")
+        await asyncio.sleep(interval_minutes * 60)
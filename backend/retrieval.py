@@ -0,0 +1,209 @@
+"""
+Offline BM25 retrieval index over scenario and quiz content for the AI guide.
+
+Passages come from scenario descriptions, learning objectives and quiz
+question texts. Explanations are left out: they give away the correct option,
+which learners only see after submitting an attempt. The index is stored term-major, like a CSC
+sparse matrix: for each term a slice of passage ids and precomputed BM25
+weights, so scoring a query is a handful of vectorized adds. It is saved as
+.npy files under GUIDE_INDEX_DIR, one directory per catalog version, and
+loaded with mmap_mode="r" so a fresh worker starts without rebuilding.
+The cached index is checked against the catalog version on every request, so
+catalog changes made through any worker are picked up.
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+from threading import Lock
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from config import GUIDE_INDEX_DIR
+from database import primary_session
+from models import Quiz, QuizQuestion, Scenario
+from sync import catalog_version
+
+K1 = 1.5
+B = 0.75
+INDEX_FORMAT = 2  # Bump when passages change shape so stale indexes on disk are not loaded
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it its of on or should
+that the their this to what when which who why will with you your
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def index_version(db: Session) -> str:
+    """Changes whenever the catalog or the index format does."""
+    return f"f{INDEX_FORMAT}-{catalog_version(db)}"
+
+
+def collect_passages(db: Session) -> List[dict]:
+    """Every searchable passage with the scenario it belongs to."""
+    passages = []
+    for scenario in db.query(Scenario).order_by(Scenario.id):
+        passages.append({
+            "scenario_id": scenario.id,
+            "source": "scenario",
+            "text": f"{scenario.title}: {scenario.description}",
+        })
+        for objective in scenario.learning_objectives or []:
+            passages.append({"scenario_id": scenario.id, "source": "objective", "text": objective})
+
+    rows = db.query(QuizQuestion.question_text, Quiz.scenario_id).join(Quiz, Quiz.id == QuizQuestion.quiz_id).order_by(
+        Quiz.scenario_id, QuizQuestion.quiz_id, QuizQuestion.position
+    )
+    for question_text, scenario_id in rows:
+        passages.append({"scenario_id": scenario_id, "source": "question", "text": question_text})
+    return passages
+
+
+class GuideIndex:
+    """Term-major BM25 index; arrays may be memory-mapped from disk."""
+
+    def __init__(self, version, vocabulary, passages, indptr, doc_ids, weights, passage_scenarios):
+        self.version = version
+        self.vocabulary = vocabulary
+        self.passages = passages
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.passage_scenarios = passage_scenarios
+
+    @classmethod
+    def build(cls, version: str, passages: List[dict]) -> "GuideIndex":
+        documents = [tokenize(passage["text"]) for passage in passages]
+        lengths = np.array([len(tokens) for tokens in documents], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        postings = {}
+        for doc_id, tokens in enumerate(documents):
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+
+        vocabulary = {term: index for index, term in enumerate(sorted(postings))}
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_ids, weights = [], []
+        num_docs = len(documents)
+        for term, index in vocabulary.items():
+            counts = postings[term]
+            idf = np.log(1 + (num_docs - len(counts) + 0.5) / (len(counts) + 0.5))
+            ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            norm = K1 * (1 - B + B * lengths[ids] / average_length)
+            doc_ids.append(ids)
+            weights.append((idf * tf * (K1 + 1) / (tf + norm)).astype(np.float32))
+            indptr[index + 1] = indptr[index] + len(ids)
+
+        return cls(
+            version,
+            vocabulary,
+            passages,
+            indptr,
+            np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=np.int32),
+            np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32),
+            np.array([passage["scenario_id"] for passage in passages], dtype=np.int32),
+        )
+
+    def search(self, query: str, scenario_id: Optional[int] = None, top_k: int = 3) -> List[dict]:
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        for token in set(tokenize(query)):
+            index = self.vocabulary.get(token)
+            if index is None:
+                continue
+            start, end = self.indptr[index], self.indptr[index + 1]
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+
+        if scenario_id is not None:
+            scores[self.passage_scenarios != scenario_id] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [{**self.passages[i], "score": float(scores[i])} for i in candidates]
+
+    def save(self, root: str):
+        """Write the index to root/<version>, replacing nothing already there."""
+        target = os.path.join(root, self.version)
+        if os.path.isdir(target):
+            return
+        os.makedirs(root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=root, prefix=".build-")
+        np.save(os.path.join(staging, "indptr.npy"), self.indptr)
+        np.save(os.path.join(staging, "doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(staging, "weights.npy"), self.weights)
+        np.save(os.path.join(staging, "passage_scenarios.npy"), self.passage_scenarios)
+        with open(os.path.join(staging, "vocabulary.json"), "w") as f:
+            json.dump(self.vocabulary, f)
+        with open(os.path.join(staging, "passages.json"), "w") as f:
+            json.dump(self.passages, f)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)  # Another worker saved it first
+        for name in os.listdir(root):
+            if name != self.version and not name.startswith("."):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    @classmethod
+    def load(cls, root: str, version: str) -> Optional["GuideIndex"]:
+        directory = os.path.join(root, version)
+        if not os.path.isdir(directory):
+            return None
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in ("indptr", "doc_ids", "weights", "passage_scenarios")
+        }
+        with open(os.path.join(directory, "vocabulary.json")) as f:
+            vocabulary = json.load(f)
+        with open(os.path.join(directory, "passages.json")) as f:
+            passages = json.load(f)
+        return cls(version, vocabulary, passages, **arrays)
+
+
+_index: Optional[GuideIndex] = None
+_index_lock = Lock()
+
+
+def get_guide_index(db: Session, root: str = GUIDE_INDEX_DIR) -> GuideIndex:
+    """Return the index for the current catalog, loading it from disk or building it when it changed."""
+    global _index
+    with primary_session(db) as primary:
+        version = index_version(primary)
+        index = _index
+        if index is None or index.version != version:
+            with _index_lock:
+                if _index is None or _index.version != version:
+                    loaded = GuideIndex.load(root, version)
+                    if loaded is None:
+                        loaded = GuideIndex.build(version, collect_passages(primary))
+                        loaded.save(root)
+                    _index = loaded
+                index = _index
+    return index
+
+
+def invalidate_guide_index():
+    """Drop the cached index so the next request picks up the new catalog."""
+    global _index
+    with _index_lock:
+        _index = None
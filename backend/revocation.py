@@ -0,0 +1,145 @@
+"""
+In-memory revocation set for logged-out access tokens.
+
+Tokens carry a jti that is also the key of their user_sessions row. Logging
+out revokes that jti here, so authentication checks a token with a dict
+lookup instead of querying sessions by token. Entries only need to live until
+the token's own exp, after which the signature check rejects it anyway, so
+they are dropped in exp order as they lapse.
+
+The set is per process, so with several workers a logout is only known
+immediately to the worker that handled it. The others learn of it in two ways:
+revocation_loop() pulls sessions that ended since its last pass every
+REVOCATION_REFRESH_SECONDS, and is_revoked() checks the session row of a jti
+it has not seen, remembering for the same interval that the session was
+still active. A logged-out token is therefore accepted by another worker for
+at most REVOCATION_REFRESH_SECONDS. load_revocations() fills the set at
+startup.
+"""
+
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, REVOCATION_REFRESH_SECONDS
+from models import UserSession
+
+_revoked: Dict[str, float] = {}
+_expiry: List[Tuple[float, str]] = []
+_active: Dict[str, float] = {}  # jti -> when its session was last seen active
+_lock = Lock()
+
+
+def _prune(now: float):
+    while _expiry and _expiry[0][0] <= now:
+        exp, jti = heapq.heappop(_expiry)
+        if _revoked.get(jti) == exp:
+            del _revoked[jti]
+
+
+def _token_exp(login_time: datetime) -> float:
+    # The token was issued just before the session row, so this exp is never early
+    lifetime = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return (login_time + lifetime).replace(tzinfo=timezone.utc).timestamp()
+
+
+def revoke(jti: str, exp: float):
+    """Reject the token with this jti until its exp (a Unix timestamp)."""
+    now = time.time()
+    if exp <= now:
+        return
+    with _lock:
+        _prune(now)
+        _revoked[jti] = exp
+        heapq.heappush(_expiry, (exp, jti))
+        _active.pop(jti, None)
+
+
+def is_revoked(jti: str, db: Optional[Session] = None) -> bool:
+    """Whether the token with this jti was logged out.
+
+    With a session, a jti not confirmed active in the last
+    REVOCATION_REFRESH_SECONDS is looked up in user_sessions, in case another
+    worker handled its logout.
+    """
+    now = time.time()
+    exp = _revoked.get(jti)
+    if exp is not None and exp > now:
+        return True
+    if db is None or now - _active.get(jti, 0) < REVOCATION_REFRESH_SECONDS:
+        return False
+    row = db.query(UserSession.is_active, UserSession.login_time).filter(UserSession.session_token == jti).first()
+    if row is not None and not row.is_active:
+        exp = _token_exp(row.login_time)
+        revoke(jti, exp)
+        return exp > now
+    with _lock:
+        _active[jti] = now
+    return False
+
+
+def load_revocations(db: Session) -> int:
+    """Revoke the tokens of ended sessions that have not expired yet; returns how many."""
+    lifetime = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    rows = db.query(UserSession.session_token, UserSession.login_time).filter(
+        UserSession.is_active == False,
+        UserSession.login_time >= datetime.utcnow() - lifetime
+    ).all()
+    for jti, login_time in rows:
+        revoke(jti, _token_exp(login_time))
+    return len(rows)
+
+
+def refresh_revocations(db: Session, since: datetime) -> List[Tuple[int, str]]:
+    """Revoke tokens of sessions that ended at or after since; returns (user_id, jti) of new ones."""
+    lifetime = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    rows = db.query(UserSession.user_id, UserSession.session_token, UserSession.login_time).filter(
+        UserSession.is_active == False,
+        UserSession.logout_time >= since,
+        UserSession.login_time >= datetime.utcnow() - lifetime
+    ).all()
+    revoked = []
+    for user_id, jti, login_time in rows:
+        if jti not in _revoked:
+            revoke(jti, _token_exp(login_time))
+            revoked.append((user_id, jti))
+
+    now = time.time()
+    with _lock:
+        for jti in [jti for jti, seen in _active.items() if now - seen >= REVOCATION_REFRESH_SECONDS]:
+            del _active[jti]
+    return revoked
+
+
+async def revocation_loop(
+    engine: Engine,
+    on_revoked: Optional[Callable[[int, str], None]] = None,
+    interval_seconds: float = REVOCATION_REFRESH_SECONDS
+):
+    """Pick up logouts from other workers forever; meant to be started as a background task.
+
+    on_revoked(user_id, jti) is called for each newly revoked token.
+    """
+    since = datetime.utcnow()
+
+    def refresh():
+        with Session(engine) as db:
+            return refresh_revocations(db, since - timedelta(seconds=interval_seconds))
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        started = datetime.utcnow()
+        try:
+            for user_id, jti in await run_in_threadpool(refresh):
+                if on_revoked is not None:
+                    on_revoked(user_id, jti)
+            since = started
+        except Exception as e:
+            print(f"Revocation refresh failed: {e}")
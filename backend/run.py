@@ -7,6 +7,7 @@ Run this script to start the FastAPI server with database initialization.
 import uvicorn
 from database import engine
 from models import Base
+from migrations import run_migrations
 from seed_data import seed_database
 from sqlalchemy.orm import Session
 
@@ -16,6 +17,7 @@ def init_database():
     
     # Create all tables
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     
     # Seed the database with initial data
     db = Session(engine)
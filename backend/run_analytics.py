@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Script to refresh per-question quiz analytics.
+Only attempts newer than each quiz's high-water mark are processed, so it is
+cheap to run on a schedule.
+"""
+
+from database import SessionLocal
+from item_analytics import refresh_all_analytics
+
+def main():
+    """Run the incremental item analytics job for all quizzes."""
+    db = SessionLocal()
+    try:
+        print("Refreshing quiz item analytics...")
+        processed = refresh_all_analytics(db)
+        print(f"Processed {processed} new quiz attempts.")
+    except Exception as e:
+        print(f"Error refreshing analytics: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Script to expire, archive and purge old user sessions.
+Runs one retention pass, then ANALYZE and VACUUM the database.
+"""
+
+from database import engine
+from models import Base
+from retention import run_retention
+
+def main():
+    """Run a session retention pass with compaction."""
+    Base.metadata.create_all(bind=engine)
+    print("Running session retention...")
+    stats = run_retention(engine, vacuum=True)
+    print(
+        f"Expired {stats['expired']}, archived {stats['archived']} and purged "
+        f"{stats['purged']} sessions; removed {stats['idempotency_keys']} idempotency keys "
+        f"and {stats['outbox_messages']} delivered outbox messages."
+    )
+
+if __name__ == "__main__":
+    main()
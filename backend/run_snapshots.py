@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Script to refresh the columnar analytics snapshot used by the /reports endpoints.
+Only rows newer than each table's watermark are exported, so it is cheap to run
+on a schedule.
+"""
+
+from database import engine
+from migrations import run_migrations
+from models import Base
+from snapshots import build_snapshot
+
+def main():
+    """Append new attempts, progress and sessions to the analytics snapshot."""
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    print("Building analytics snapshot...")
+    stats = build_snapshot(engine)
+    print(
+        f"Appended {stats['quiz_attempts']} quiz attempts, {stats['user_progress']} progress "
+        f"changes and {stats['user_sessions']} sessions"
+        + (" (progress compacted)." if stats["compacted"] else ".")
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 
 # User schemas
 class UserBase(BaseModel):
@@ -43,6 +43,11 @@ class ScenarioResponse(ScenarioBase):
     class Config:
         from_attributes = True
 
+class ScenarioAvailability(BaseModel):
+    scenario_id: int
+    status: str  # locked, unlocked, completed
+    missing_prerequisites: List[int] = []
+
 # Quiz schemas
 class Question(BaseModel):
     id: int
@@ -64,16 +69,47 @@ class QuizCreate(QuizBase):
 class QuizResponse(QuizBase):
     id: int
     scenario_id: int
+    total_questions: int
     created_at: datetime
     updated_at: datetime
     
     class Config:
         from_attributes = True
 
+# Quiz delivery schemas: what learners receive, without answers
+class DeliveredQuestion(BaseModel):
+    id: int
+    question_text: str
+    options: List[str]
+
+class QuizDeliveryResponse(BaseModel):
+    id: int
+    scenario_id: int
+    title: str
+    description: Optional[str] = None
+    questions: List[DeliveredQuestion]
+    total_questions: int
+    passing_score: float
+    time_limit_minutes: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    sample_token: Optional[str] = None  # Only on sampled quizzes; send it back with the attempt
+
+class AnswerCheck(BaseModel):
+    answer: int
+
+class AnswerFeedback(BaseModel):
+    question_id: int
+    correct: bool
+    correct_answer: int
+    explanation: Optional[str] = None
+
 # Quiz attempt schemas
 class QuizAttemptCreate(BaseModel):
     quiz_id: int
     answers: List[int]  # List of answer indices
+    question_ids: Optional[List[int]] = None  # Ids of the questions answered, for paged/sampled quizzes
+    sample_token: Optional[str] = None  # From a sampled quiz, to be graded on that sample
     completed_at: Optional[datetime] = None
 
 class QuizAttemptResponse(BaseModel):
@@ -81,6 +117,7 @@ class QuizAttemptResponse(BaseModel):
     user_id: int
     quiz_id: int
     answers: List[int]
+    question_ids: Optional[List[int]] = None
     score: float
     is_passed: bool
     time_taken_minutes: Optional[float] = None
@@ -91,6 +128,20 @@ class QuizAttemptResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Quiz analytics schemas
+class QuestionAnalytics(BaseModel):
+    question_id: int
+    responses: int
+    difficulty: Optional[float] = None
+    discrimination: Optional[float] = None
+    option_rates: List[float]
+
+class QuizAnalyticsResponse(BaseModel):
+    quiz_id: int
+    attempts_processed: int
+    last_attempt_id: int
+    questions: List[QuestionAnalytics]
+
 # User session schemas
 class UserSessionBase(BaseModel):
     session_token: str
@@ -127,6 +178,90 @@ class UserProgressResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProgressEventResponse(BaseModel):
+    scenario_id: int
+    pct: float
+    ts: datetime
+    
+    class Config:
+        from_attributes = True
+
+class ProgressRollupResponse(BaseModel):
+    bucket_start: datetime
+    events: int
+    completions: int
+    average_completion_percentage: float
+    average_minutes_to_complete: Optional[float] = None
+
+# Live event stream schemas
+class EventStreamToken(BaseModel):
+    token: str  # Pass as ?token= when opening the stream; EventSource cannot send headers
+    expires_in: int  # Seconds the token can be used to open a stream
+
+# Delta sync schemas
+class DeletedEntity(BaseModel):
+    entity: str  # scenario, quiz, progress, quiz_attempt
+    id: int
+
+class SyncResponse(BaseModel):
+    cursor: int
+    scenarios: List[ScenarioResponse]
+    quizzes: List[QuizDeliveryResponse]  # Without answers, like GET /scenarios/{id}/quiz
+    progress: List[UserProgressResponse]
+    quiz_attempts: List[QuizAttemptResponse]
+    deleted: List[DeletedEntity]
+
+# AI guide schemas
+class GuideQuestion(BaseModel):
+    question: str
+    scenario_id: Optional[int] = None  # Restrict answers to the current scenario
+    top_k: int = 3
+
+class GuidePassage(BaseModel):
+    scenario_id: int
+    source: str  # scenario, objective, question
+    text: str
+    score: float
+
+class GuideAnswer(BaseModel):
+    passages: List[GuidePassage]
+
+# Analytics report schemas
+class ScenarioFunnel(BaseModel):
+    scenario_id: int
+    started: int
+    reached_25: int
+    reached_50: int
+    reached_75: int
+    completed: int
+    passed_quiz: int
+
+class FunnelReport(BaseModel):
+    snapshot_at: datetime
+    scenarios: List[ScenarioFunnel]
+
+class ScoreHistogram(BaseModel):
+    difficulty_level: str
+    attempts: int
+    mean_score: Optional[float] = None
+    pass_rate: Optional[float] = None
+    bin_edges: List[float]
+    counts: List[int]
+
+class ScoreDistributionReport(BaseModel):
+    snapshot_at: datetime
+    difficulties: List[ScoreHistogram]
+
+class RetentionCohort(BaseModel):
+    cohort_start: date  # Monday of the week of the users' first login
+    users: int
+    active_users: List[int]  # Users with a login in each week since the cohort started
+    retention: List[float]
+
+class RetentionReport(BaseModel):
+    snapshot_at: datetime
+    cohorts: List[RetentionCohort]
+
 # Authentication schemas
 class Token(BaseModel):
     access_token: str
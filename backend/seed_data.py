@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from models import User, Scenario, Quiz
 from auth import get_password_hash
+from quiz_questions import build_question_rows
 from datetime import datetime
 
 def seed_database(db: Session):
@@ -271,7 +272,9 @@ def seed_database(db: Session):
     for quiz_data in quizzes_data:
         existing_quiz = db.query(Quiz).filter(Quiz.scenario_id == quiz_data["scenario_id"]).first()
         if not existing_quiz:
+            questions = quiz_data.pop("questions")
             quiz = Quiz(**quiz_data)
+            quiz.questions = build_question_rows(questions)
             db.add(quiz)
     
     db.commit()
@@ -0,0 +1,447 @@
+"""
+Columnar analytics snapshots of attempts, progress and sessions.
+
+Cross-user reports would otherwise scan the live tables row by row and hold
+SQLite's lock while they do. Instead a builder copies the rows into typed
+column-per-file arrays under SNAPSHOT_DIR, described by a small
+manifest.json, and reports are computed with NumPy over memory-mapped
+columns without touching the database.
+
+Each run only appends what is new since the table's watermark:
+
+- quiz_attempts are immutable and appended by id.
+- user_progress rows change in place, so they are appended by change_seq
+  (deletions come from sync tombstones) and de-duplicated at read time,
+  keeping the latest version per id. The table is rewritten when stale
+  versions outnumber live rows.
+- user_sessions are appended by (login_time, id) since only the immutable
+  user_id and login_time are exported and retention can reuse ids.
+- scenarios are a small dimension table rewritten every run.
+
+Column files are only ever appended to, and the manifest (written atomically
+afterwards) records how many rows are valid, so a reader never sees a partial
+append. Builds hold an OS file lock on SNAPSHOT_DIR/.build.lock, so the
+background loop of every worker and run_snapshots.py take turns instead of
+appending to the same column files at once.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from threading import Lock
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from config import SNAPSHOT_DIR, SNAPSHOT_BATCH_SIZE, SNAPSHOT_INTERVAL_MINUTES
+from models import Quiz, QuizAttempt, Scenario, Tombstone, UserProgress, UserSession
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DIFFICULTY_LEVELS = ("beginner", "intermediate", "advanced")
+
+COMPACT_MIN_ROWS = 1000  # Smaller progress tables are never worth rewriting
+
+SCHEMAS = {
+    "quiz_attempts": {
+        "id": "int64", "user_id": "int32", "quiz_id": "int32", "scenario_id": "int32",
+        "score": "float32", "is_passed": "bool", "created_at": "datetime64[s]",
+    },
+    "user_progress": {
+        "id": "int64", "user_id": "int32", "scenario_id": "int32", "completion_percentage": "float32",
+        "change_seq": "int64", "deleted": "bool",
+    },
+    "user_sessions": {
+        "id": "int64", "user_id": "int32", "login_time": "datetime64[s]",
+    },
+    "scenarios": {
+        "id": "int32", "difficulty": "int8",  # Index into DIFFICULTY_LEVELS, -1 if unknown
+    },
+}
+
+_thread_lock = Lock()
+
+
+# Storage
+
+@contextmanager
+def _build_lock(root: str):
+    """Exclusive across threads and processes building into root; released if the holder dies."""
+    with _thread_lock, open(os.path.join(root, ".build.lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ten seconds
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_manifest(root: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(root, "manifest.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(root: str, manifest: dict):
+    manifest["generation"] = manifest.get("generation", 0) + 1
+    manifest["built_at"] = datetime.utcnow().isoformat()
+    staging = os.path.join(root, ".manifest.json")
+    with open(staging, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, os.path.join(root, "manifest.json"))
+
+
+def _new_table(root: str, name: str, manifest: dict) -> dict:
+    """Start an empty table in a fresh directory; the old one is removed once the manifest moves."""
+    generation = manifest.get("generation", 0) + 1
+    in_use = {table["path"] for table in manifest["tables"].values()}
+    while f"{name}.{generation}" in in_use:
+        generation += 1
+    directory = f"{name}.{generation}"
+    os.makedirs(os.path.join(root, directory), exist_ok=True)
+    return {"path": directory, "rows": 0, "watermark": {}, "columns": SCHEMAS[name]}
+
+
+def _append(root: str, table: dict, columns: Dict[str, np.ndarray]):
+    directory = os.path.join(root, table["path"])
+    for name, dtype in table["columns"].items():
+        path = os.path.join(directory, f"{name}.bin")
+        itemsize = np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            f.truncate(table["rows"] * itemsize)  # Drop bytes from an append the manifest never recorded
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+    table["rows"] += len(next(iter(columns.values())))
+
+
+def _remove_stale_directories(root: str, manifest: dict):
+    live = {table["path"] for table in manifest["tables"].values()}
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and name not in live:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _datetimes(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[s]")
+
+
+# Builders
+
+def _export_attempts(db: Session, root: str, table: dict, batch_size: int) -> int:
+    appended = 0
+    while True:
+        last_id = table["watermark"].get("id", 0)
+        rows = db.execute(
+            select(
+                QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.quiz_id, Quiz.scenario_id,
+                QuizAttempt.score, QuizAttempt.is_passed, QuizAttempt.created_at
+            ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).where(
+                QuizAttempt.id > last_id
+            ).order_by(QuizAttempt.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return appended
+        ids, user_ids, quiz_ids, scenario_ids, scores, passed, created = zip(*rows)
+        _append(root, table, {
+            "id": ids, "user_id": user_ids, "quiz_id": quiz_ids, "scenario_id": scenario_ids,
+            "score": scores, "is_passed": [bool(p) for p in passed], "created_at": _datetimes(created),
+        })
+        table["watermark"]["id"] = ids[-1]
+        appended += len(rows)
+
+
+def _export_progress(db: Session, root: str, table: dict, batch_size: int) -> int:
+    appended = 0
+    while True:
+        last_seq = table["watermark"].get("change_seq", 0)
+        rows = db.execute(
+            select(
+                UserProgress.id, UserProgress.user_id, UserProgress.scenario_id,
+                UserProgress.completion_percentage, UserProgress.change_seq
+            ).where(UserProgress.change_seq > last_seq).order_by(UserProgress.change_seq).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        ids, user_ids, scenario_ids, percentages, seqs = zip(*rows)
+        _append(root, table, {
+            "id": ids, "user_id": user_ids, "scenario_id": scenario_ids,
+            "completion_percentage": [p or 0.0 for p in percentages], "change_seq": seqs,
+            "deleted": np.zeros(len(rows), dtype=bool),
+        })
+        table["watermark"]["change_seq"] = seqs[-1]
+        appended += len(rows)
+
+    while True:
+        last_seq = table["watermark"].get("tombstone_seq", 0)
+        rows = db.execute(
+            select(Tombstone.entity_id, Tombstone.change_seq).where(
+                Tombstone.entity == "progress",
+                Tombstone.change_seq > last_seq
+            ).order_by(Tombstone.change_seq).limit(batch_size)
+        ).all()
+        if not rows:
+            return appended
+        ids, seqs = zip(*rows)
+        count = len(rows)
+        _append(root, table, {
+            "id": ids, "user_id": np.zeros(count), "scenario_id": np.zeros(count),
+            "completion_percentage": np.zeros(count), "change_seq": seqs,
+            "deleted": np.ones(count, dtype=bool),
+        })
+        table["watermark"]["tombstone_seq"] = seqs[-1]
+        appended += count
+
+
+def _export_sessions(db: Session, root: str, table: dict, batch_size: int) -> int:
+    appended = 0
+    while True:
+        watermark = table["watermark"]
+        query = select(UserSession.id, UserSession.user_id, UserSession.login_time)
+        if "login_time" in watermark:
+            last_login = datetime.fromisoformat(watermark["login_time"])
+            query = query.where(or_(
+                UserSession.login_time > last_login,
+                and_(UserSession.login_time == last_login, UserSession.id > watermark["id"])
+            ))
+        rows = db.execute(query.order_by(UserSession.login_time, UserSession.id).limit(batch_size)).all()
+        if not rows:
+            return appended
+        ids, user_ids, logins = zip(*rows)
+        _append(root, table, {"id": ids, "user_id": user_ids, "login_time": _datetimes(logins)})
+        watermark["login_time"] = logins[-1].isoformat()
+        watermark["id"] = ids[-1]
+        appended += len(rows)
+
+
+def _export_scenarios(db: Session, root: str, manifest: dict) -> dict:
+    table = _new_table(root, "scenarios", manifest)
+    rows = db.execute(select(Scenario.id, Scenario.difficulty_level).order_by(Scenario.id)).all()
+    levels = {level: index for index, level in enumerate(DIFFICULTY_LEVELS)}
+    _append(root, table, {
+        "id": [row.id for row in rows],
+        "difficulty": [levels.get(row.difficulty_level, -1) for row in rows],
+    })
+    return table
+
+
+def _compact_progress(root: str, manifest: dict) -> bool:
+    """Rewrite user_progress without superseded versions once they dominate."""
+    table = manifest["tables"]["user_progress"]
+    columns = _open_table(root, table)
+    live = _latest_progress(columns)
+    if table["rows"] < COMPACT_MIN_ROWS or len(live) * 2 > table["rows"]:
+        return False
+    compacted = _new_table(root, "user_progress", manifest)
+    _append(root, compacted, {name: column[live] for name, column in columns.items()})
+    compacted["watermark"] = table["watermark"]
+    manifest["tables"]["user_progress"] = compacted
+    return True
+
+
+def build_snapshot(engine: Engine, root: str = SNAPSHOT_DIR, batch_size: int = SNAPSHOT_BATCH_SIZE) -> dict:
+    """Append new rows to every snapshot table and return rows appended per table."""
+    os.makedirs(root, exist_ok=True)
+    with _build_lock(root):
+        manifest = _read_manifest(root) or {"tables": {}}
+        tables = manifest["tables"]
+        for name in ("quiz_attempts", "user_progress", "user_sessions"):
+            if name not in tables:
+                tables[name] = _new_table(root, name, manifest)
+
+        db = Session(engine)
+        try:
+            stats = {
+                "quiz_attempts": _export_attempts(db, root, tables["quiz_attempts"], batch_size),
+                "user_progress": _export_progress(db, root, tables["user_progress"], batch_size),
+                "user_sessions": _export_sessions(db, root, tables["user_sessions"], batch_size),
+            }
+            tables["scenarios"] = _export_scenarios(db, root, manifest)
+        finally:
+            db.close()
+
+        stats["compacted"] = _compact_progress(root, manifest)
+        _write_manifest(root, manifest)
+        _remove_stale_directories(root, manifest)
+        return stats
+
+
+async def snapshot_loop(engine: Engine, interval_minutes: int = SNAPSHOT_INTERVAL_MINUTES):
+    """Refresh the analytics snapshot forever; meant to be started as a background task."""
+    while True:
+        try:
+            await run_in_threadpool(build_snapshot, engine)
+        except Exception as e:
+            print(f"Analytics snapshot failed: {e}")
+        await asyncio.sleep(interval_minutes * 60)
+
+
+# Readers
+
+def _open_table(root: str, table: dict) -> Dict[str, np.ndarray]:
+    columns = {}
+    for name, dtype in table["columns"].items():
+        if table["rows"] == 0:
+            columns[name] = np.zeros(0, dtype=dtype)
+        else:
+            path = os.path.join(root, table["path"], f"{name}.bin")
+            columns[name] = np.memmap(path, dtype=dtype, mode="r", shape=(table["rows"],))
+    return columns
+
+
+def _latest_progress(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Indices of the newest version of each progress row, excluding deleted rows."""
+    if len(columns["id"]) == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((columns["change_seq"], columns["id"]))
+    ids = columns["id"][order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = ids[1:] != ids[:-1]
+    latest = order[last]
+    return latest[~columns["deleted"][latest]]
+
+
+class Snapshot:
+    """Memory-mapped columns of one manifest generation."""
+
+    def __init__(self, root: str, manifest: dict):
+        self.generation = manifest["generation"]
+        self.built_at = datetime.fromisoformat(manifest["built_at"])
+        self.tables = {name: _open_table(root, table) for name, table in manifest["tables"].items()}
+        progress = self.tables["user_progress"]
+        latest = _latest_progress(progress)
+        self.progress = {name: np.asarray(column[latest]) for name, column in progress.items()}
+
+
+_snapshot: Optional[Snapshot] = None
+_snapshot_lock = Lock()
+
+
+def get_snapshot(root: str = SNAPSHOT_DIR) -> Optional[Snapshot]:
+    """The latest snapshot, reopened only when the manifest generation changes."""
+    global _snapshot
+    manifest = _read_manifest(root)
+    if manifest is None:
+        return None
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.generation != manifest["generation"]:
+            _snapshot = Snapshot(root, manifest)
+        return _snapshot
+
+
+# Reports
+
+FUNNEL_THRESHOLDS = (("reached_25", 25.0), ("reached_50", 50.0), ("reached_75", 75.0), ("completed", 100.0))
+
+
+def completion_funnels(snapshot: Snapshot) -> List[dict]:
+    """Learners per scenario at each completion stage, and those who passed its quiz."""
+    scenario_ids = snapshot.tables["scenarios"]["id"]
+    size = int(scenario_ids.max()) + 1 if len(scenario_ids) else 0
+    progress = snapshot.progress
+    stages = {"started": np.bincount(progress["scenario_id"], minlength=size)}
+    for stage, threshold in FUNNEL_THRESHOLDS:
+        reached = progress["completion_percentage"] >= threshold
+        stages[stage] = np.bincount(progress["scenario_id"][reached], minlength=size)
+
+    attempts = snapshot.tables["quiz_attempts"]
+    passed = np.asarray(attempts["is_passed"])
+    pairs = np.unique(
+        (attempts["user_id"][passed].astype(np.int64) << 32) | attempts["scenario_id"][passed].astype(np.int64)
+    )
+    stages["passed_quiz"] = np.bincount((pairs & 0xFFFFFFFF).astype(np.int64), minlength=size)
+
+    return [
+        {"scenario_id": int(scenario_id), **{stage: int(counts[scenario_id]) for stage, counts in stages.items()}}
+        for scenario_id in scenario_ids
+    ]
+
+
+def score_distributions(snapshot: Snapshot, bins: int = 10) -> List[dict]:
+    """Histogram of quiz scores per scenario difficulty level."""
+    scenarios = snapshot.tables["scenarios"]
+    attempts = snapshot.tables["quiz_attempts"]
+    size = max(int(scenarios["id"].max()) if len(scenarios["id"]) else 0,
+               int(attempts["scenario_id"].max()) if len(attempts["scenario_id"]) else 0) + 1
+    difficulty_of = np.full(size, -1, dtype=np.int8)
+    difficulty_of[scenarios["id"]] = scenarios["difficulty"]
+
+    scores = np.asarray(attempts["score"])
+    difficulty = difficulty_of[attempts["scenario_id"]]
+    edges = np.linspace(0.0, 100.0, bins + 1)
+    report = []
+    for index, level in enumerate(DIFFICULTY_LEVELS):
+        mask = difficulty == index
+        level_scores = scores[mask]
+        counts, _ = np.histogram(level_scores, bins=edges)
+        report.append({
+            "difficulty_level": level,
+            "attempts": int(mask.sum()),
+            "mean_score": float(level_scores.mean()) if len(level_scores) else None,
+            "pass_rate": float(attempts["is_passed"][mask].mean()) if len(level_scores) else None,
+            "bin_edges": edges.tolist(),
+            "counts": counts.tolist(),
+        })
+    return report
+
+
+_EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+
+def cohort_retention(snapshot: Snapshot, weeks: int = 8, cohorts: int = 12) -> List[dict]:
+    """Weekly login retention for cohorts grouped by the week of each user's first login."""
+    sessions = snapshot.tables["user_sessions"]
+    if len(sessions["user_id"]) == 0:
+        return []
+    user_ids = np.asarray(sessions["user_id"], dtype=np.int64)
+    days = sessions["login_time"].astype("datetime64[D]").astype(np.int64)
+    week = (days + _EPOCH_WEEKDAY) // 7  # Weeks starting on Monday
+
+    first_week = np.full(int(user_ids.max()) + 1, np.iinfo(np.int64).max)
+    np.minimum.at(first_week, user_ids, week)
+    cohort = first_week[user_ids]
+    offset = week - cohort
+
+    in_window = offset < weeks
+    active = np.unique((user_ids[in_window] << 16) | offset[in_window])
+    active_users, active_offsets = active >> 16, active & 0xFFFF
+    cohort_weeks, cohort_index = np.unique(first_week[active_users], return_inverse=True)
+
+    matrix = np.zeros((len(cohort_weeks), weeks), dtype=np.int64)
+    np.add.at(matrix, (cohort_index, active_offsets), 1)
+
+    report = []
+    for row, cohort_week in list(enumerate(cohort_weeks))[-cohorts:]:
+        size = int(matrix[row, 0])
+        start = date(1970, 1, 1) + timedelta(days=int(cohort_week) * 7 - _EPOCH_WEEKDAY)
+        report.append({
+            "cohort_start": start,
+            "users": size,
+            "active_users": matrix[row].tolist(),
+            "retention": (matrix[row] / size).tolist() if size else [0.0] * weeks,
+        })
+    return report
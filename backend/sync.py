@@ -0,0 +1,146 @@
+"""
+Change sequence and delta sync for offline-first clients.
+
+Every insert, update or delete of a synced entity is stamped with a value from
+a single monotonically increasing counter (sync_state.last_seq), allocated in
+the same transaction as the change. Bumping the counter takes the write lock,
+so transactions commit in sequence order and a client that has seen everything
+up to cursor N never misses a later change. Deletions leave a tombstone row.
+"""
+
+from typing import Dict
+
+from sqlalchemy import bindparam, event, func, select, update
+from sqlalchemy.orm import Session, selectinload
+
+from models import Quiz, QuizAttempt, QuizQuestion, Scenario, SyncState, Tombstone, UserProgress
+from quiz_questions import quiz_to_dict
+
+# Synced models and the entity name used in tombstones
+TRACKED = {
+    Scenario: "scenario",
+    Quiz: "quiz",
+    UserProgress: "progress",
+    QuizAttempt: "quiz_attempt",
+}
+
+
+def allocate_seqs(session: Session, count: int) -> int:
+    """Reserve count sequence numbers and return the first one."""
+    bumped = session.execute(
+        update(SyncState).where(SyncState.id == 1).values(last_seq=SyncState.last_seq + count)
+    )
+    if bumped.rowcount == 0:
+        session.execute(SyncState.__table__.insert().values(id=1, last_seq=count))
+    last_seq = session.execute(select(SyncState.last_seq).where(SyncState.id == 1)).scalar_one()
+    return last_seq - count + 1
+
+
+def catalog_version(session: Session) -> str:
+    """Changes whenever a scenario, quiz or question is created, changed or deleted.
+
+    In-process caches of catalog data are keyed on this and compare it on
+    every read, so a write handled by another worker is picked up too.
+    """
+    row = session.execute(select(
+        select(func.max(Scenario.change_seq)).scalar_subquery(),
+        select(func.count(Scenario.id)).scalar_subquery(),
+        select(func.max(Quiz.change_seq)).scalar_subquery(),
+        select(func.count(Quiz.id)).scalar_subquery(),
+    )).one()
+    return "s{}-{}-q{}-{}".format(row[0] or 0, row[1], row[2] or 0, row[3])
+
+
+def current_seq(session: Session) -> int:
+    last_seq = session.execute(select(SyncState.last_seq).where(SyncState.id == 1)).scalar()
+    return last_seq or 0
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_changes(session: Session, flush_context, instances):
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if type(obj) in TRACKED and (obj in session.new or session.is_modified(obj))
+    ]
+    deleted = [obj for obj in session.deleted if type(obj) in TRACKED]
+
+    # Question edits change the quiz payload clients hold
+    quiz_ids = {
+        obj.quiz_id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, QuizQuestion) and obj.quiz_id is not None
+    }
+    quizzes_in_session = {obj.id for obj in changed if isinstance(obj, Quiz)}
+    quiz_ids -= quizzes_in_session
+    quiz_ids -= {obj.id for obj in deleted if isinstance(obj, Quiz)}
+
+    count = len(changed) + len(deleted) + len(quiz_ids)
+    if count == 0:
+        return
+    seq = allocate_seqs(session, count)
+
+    for obj in changed:
+        obj.change_seq = seq
+        seq += 1
+    for obj in deleted:
+        session.add(Tombstone(
+            change_seq=seq,
+            entity=TRACKED[type(obj)],
+            entity_id=obj.id,
+            user_id=getattr(obj, "user_id", None)
+        ))
+        seq += 1
+    for quiz_id in sorted(quiz_ids):
+        session.execute(update(Quiz).where(Quiz.id == quiz_id).values(change_seq=seq))
+        seq += 1
+
+
+def backfill_change_seqs(session: Session):
+    """Stamp rows written before change tracking existed."""
+    for model in TRACKED:
+        ids = [row_id for (row_id,) in session.execute(
+            select(model.id).where(model.change_seq.is_(None)).order_by(model.id)
+        )]
+        if not ids:
+            continue
+        first = allocate_seqs(session, len(ids))
+        table = model.__table__
+        session.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(change_seq=bindparam("seq")),
+            [{"row_id": row_id, "seq": first + offset} for offset, row_id in enumerate(ids)]
+        )
+    session.commit()
+
+
+def collect_changes(db: Session, user_id: int, since: int) -> Dict[str, object]:
+    """Everything visible to user_id that changed after the since cursor."""
+    cursor = current_seq(db)
+
+    def window(model):
+        return model.change_seq > since, model.change_seq <= cursor
+
+    scenarios = db.query(Scenario).filter(*window(Scenario)).order_by(Scenario.change_seq).all()
+    quizzes = db.query(Quiz).options(selectinload(Quiz.questions)).filter(
+        *window(Quiz)
+    ).order_by(Quiz.change_seq).all()
+    progress = db.query(UserProgress).filter(
+        UserProgress.user_id == user_id, *window(UserProgress)
+    ).order_by(UserProgress.change_seq).all()
+    attempts = db.query(QuizAttempt).filter(
+        QuizAttempt.user_id == user_id, *window(QuizAttempt)
+    ).order_by(QuizAttempt.change_seq).all()
+    tombstones = db.query(Tombstone).filter(
+        Tombstone.change_seq > since,
+        Tombstone.change_seq <= cursor,
+        (Tombstone.user_id == user_id) | Tombstone.user_id.is_(None)
+    ).order_by(Tombstone.change_seq).all()
+
+    return {
+        "cursor": cursor,
+        "scenarios": scenarios,
+        "quizzes": [quiz_to_dict(quiz, quiz.questions, len(quiz.questions), include_answers=False) for quiz in quizzes],
+        "progress": progress,
+        "quiz_attempts": attempts,
+        "deleted": [
+            {"entity": tombstone.entity, "id": tombstone.entity_id} for tombstone in tombstones
+        ],
+    }
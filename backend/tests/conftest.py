@@ -0,0 +1,77 @@
+"""
+Shared fixtures: the API runs against a throwaway SQLite database.
+
+Settings are read from the environment when config is imported, so they are
+set here before anything imports the app.
+"""
+
+import os
+import tempfile
+import uuid
+
+_workdir = tempfile.mkdtemp(prefix="agritrain-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/test.db"
+os.environ["SNAPSHOT_DIR"] = os.path.join(_workdir, "snapshots")
+os.environ["GUIDE_INDEX_DIR"] = os.path.join(_workdir, "guide_index")
+os.environ["RETENTION_INTERVAL_MINUTES"] = "0"
+os.environ["SNAPSHOT_INTERVAL_MINUTES"] = "0"
+os.environ["ADMIN_EMAILS"] = "admin@example.com"
+os.environ["IMPORT_HASH_WORKERS"] = "1"
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+QUESTIONS = [
+    {"id": 1, "question_text": "Best time to irrigate?", "options": ["Noon", "Early morning", "Night"],
+     "correct_answer": 1, "explanation": "Less evaporation in the morning."},
+    {"id": 2, "question_text": "Nitrogen-fixing crop?", "options": ["Wheat", "Maize", "Beans"],
+     "correct_answer": 2, "explanation": "Legumes host rhizobia."},
+    {"id": 3, "question_text": "Soil pH for most crops?", "options": ["4-5", "6-7", "8-9"],
+     "correct_answer": 1, "explanation": "Nutrients are most available near neutral."},
+    {"id": 4, "question_text": "Crop rotation reduces?", "options": ["Pests", "Sunlight", "Rain"],
+     "correct_answer": 0, "explanation": "Breaking host cycles starves pests."},
+]
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def _login(client, email):
+    password = "password123"
+    client.post("/auth/register", json={
+        "email": email, "username": email.split("@")[0], "password": password, "full_name": "Test User"
+    })
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]["id"]
+
+
+@pytest.fixture
+def user(client):
+    """(auth headers, user id) for a fresh user."""
+    return _login(client, f"learner-{uuid.uuid4().hex[:8]}@example.com")
+
+
+@pytest.fixture
+def admin(client):
+    return _login(client, "admin@example.com")
+
+
+@pytest.fixture
+def quiz(client):
+    """A new scenario with a four-question quiz; returns the created quiz."""
+    scenario = client.post("/scenarios", json={
+        "title": "Irrigation basics", "description": "Water management", "scenario_type": "irrigation",
+        "duration_minutes": 10
+    }).json()
+    response = client.post("/quizzes", json={
+        "scenario_id": scenario["id"], "title": "Irrigation quiz", "questions": QUESTIONS, "passing_score": 70.0
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
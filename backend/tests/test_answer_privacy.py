@@ -0,0 +1,52 @@
+def check(client, headers, quiz, question_id, answer=0):
+    return client.post(f"/quizzes/{quiz['id']}/questions/{question_id}/check", json={"answer": answer}, headers=headers)
+
+
+def test_no_read_path_returns_answers(client, user, quiz):
+    headers, _ = user
+    scenario_id = quiz["scenario_id"]
+    bodies = [
+        client.get(f"/scenarios/{scenario_id}/quiz").text,
+        client.get(f"/scenarios/{scenario_id}/quiz", headers={"Accept-Encoding": "gzip"}).text,
+        client.get(f"/scenarios/{scenario_id}/quiz?offset=1&limit=2").text,
+        client.get(f"/scenarios/{scenario_id}/quiz?sample=2").text,
+        client.get("/sync", headers=headers).text,
+    ]
+    assert str(quiz["id"]) in bodies[-1]
+    for body in bodies:
+        assert "correct_answer" not in body
+        assert "explanation" not in body
+    assert check(client, headers, quiz, 1).status_code == 403
+
+
+def test_feedback_only_for_answered_questions(client, user, quiz):
+    headers, _ = user
+    response = client.post("/quiz-attempts", json={"quiz_id": quiz["id"], "question_ids": [2], "answers": [0]},
+                           headers=headers)
+    assert response.status_code == 200
+    assert check(client, headers, quiz, 1).status_code == 403
+
+    feedback = check(client, headers, quiz, 2, answer=0)
+    assert feedback.status_code == 200
+    assert feedback.json() == {
+        "question_id": 2, "correct": False, "correct_answer": 2, "explanation": "Legumes host rhizobia."
+    }
+
+
+def test_feedback_after_full_attempt(client, user, quiz):
+    headers, _ = user
+    client.post("/quiz-attempts", json={"quiz_id": quiz["id"], "answers": [1, 2, 1, 0]}, headers=headers)
+    assert all(check(client, headers, quiz, question_id).status_code == 200 for question_id in range(1, 5))
+
+
+def test_guide_requires_login_and_hides_explanations(client, user, quiz):
+    headers, _ = user
+    ask = {"question": "Which crop is nitrogen-fixing? Legumes host rhizobia", "scenario_id": quiz["scenario_id"]}
+    assert client.post("/guide/ask", json=ask).status_code in (401, 403)
+
+    response = client.post("/guide/ask", json=ask, headers=headers)
+    assert response.status_code == 200
+    passages = response.json()["passages"]
+    assert any(passage["source"] == "question" for passage in passages)
+    for passage in passages:
+        assert "rhizobia" not in passage["text"].lower()
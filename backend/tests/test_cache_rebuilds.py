@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from catalog import get_scenario_catalog
+from conftest import QUESTIONS, _workdir
+from database import SessionLocal
+from models import Base, Quiz, Scenario
+from prerequisites import get_prerequisite_graph
+from quiz_delivery import get_scenario_quiz_delivery
+from quiz_questions import build_question_rows
+
+
+@pytest.fixture
+def lagging_replica():
+    """A session on a replica that has replicated nothing yet."""
+    engine = create_engine(f"sqlite:///{os.path.join(_workdir, 'replica.db')}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        yield db
+
+
+def test_caches_rebuild_from_primary(client, quiz, lagging_replica):
+    # Creating the quiz invalidated the caches; rebuilding them via the replica must not see it empty
+    catalog = json.loads(get_scenario_catalog(lagging_replica).body)
+    assert quiz["scenario_id"] in [scenario["id"] for scenario in catalog]
+    assert get_scenario_quiz_delivery(lagging_replica, quiz["scenario_id"]) is not None
+    assert quiz["scenario_id"] in get_prerequisite_graph(lagging_replica).prerequisites
+
+
+def test_caches_follow_writes_made_by_another_worker(client, user):
+    headers, user_id = user
+    scenario = client.post("/scenarios", json={
+        "title": "Soil testing", "description": "Sampling soil", "scenario_type": "crops", "duration_minutes": 5
+    }).json()
+    assert client.get(f"/scenarios/{scenario['id']}/quiz").status_code == 404  # Caches "no quiz"
+    client.get("/scenarios")
+
+    # Another worker's writes reach the database but not this process's invalidation hooks
+    with SessionLocal() as db:
+        other = Scenario(title="Composting", description="Organic matter", scenario_type="crops",
+                         duration_minutes=5)
+        db.add(other)
+        db.add(Quiz(scenario_id=scenario["id"], title="Soil quiz",
+                    questions=build_question_rows(QUESTIONS[:2])))
+        db.commit()
+        other_id = other.id
+
+    assert other_id in [s["id"] for s in client.get("/scenarios").json()]
+    assert client.get(f"/scenarios/{scenario['id']}/quiz").json()["total_questions"] == 2
+    response = client.post(f"/users/{user_id}/progress", json={"scenario_id": other_id, "completion_percentage": 10},
+                           headers=headers)
+    assert response.status_code == 200
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from events import broker, event_stream
+
+
+def _stream_token(client, headers, user_id):
+    response = client.post(f"/users/{user_id}/events/token", headers=headers)
+    assert response.status_code == 200
+    return response.json()["token"]
+
+
+def test_stream_requires_token(client, user):
+    _, user_id = user
+    assert client.get(f"/users/{user_id}/events").status_code == 401
+    assert client.get(f"/users/{user_id}/events", params={"token": "garbage"}).status_code == 401
+
+
+def test_stream_token_is_not_an_access_token(client, user):
+    headers, user_id = user
+    token = _stream_token(client, headers, user_id)
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def test_stream_token_only_opens_own_stream(client, user):
+    headers, user_id = user
+    token = _stream_token(client, headers, user_id)
+    assert client.get(f"/users/{user_id + 1}/events", params={"token": token}).status_code == 401
+
+
+def test_unstarted_stream_holds_no_subscription():
+    before = broker.connection_count()
+    event_stream(12345)  # Response created but never iterated
+    assert broker.connection_count() == before
+
+
+def test_logout_closes_open_streams(client, user):
+    headers, user_id = user
+    token = _stream_token(client, headers, user_id)
+    result = {}
+
+    def read_stream():
+        result["body"] = client.get(f"/users/{user_id}/events", params={"token": token}).text
+
+    reader = threading.Thread(target=read_stream)
+    reader.start()
+    deadline = time.monotonic() + 5
+    while user_id not in broker._subscribers and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    reader.join(timeout=5)
+    assert not reader.is_alive()
+    assert "event: session.closed" in result["body"]
+    assert user_id not in broker._subscribers
+
+    # The logged-out session cannot open a new stream with a token issued before logout
+    assert client.get(f"/users/{user_id}/events", params={"token": token}).status_code == 401
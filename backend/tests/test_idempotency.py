@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from database import SessionLocal
+from idempotency import _completing
+from main import _record_quiz_attempt
+from models import IdempotencyRecord, QuizAttempt
+from schemas import QuizAttemptCreate, QuizAttemptResponse
+
+ANSWERS = [1, 2, 1, 0]
+
+
+def _attempts(user_id):
+    with SessionLocal() as db:
+        return db.query(QuizAttempt).filter(QuizAttempt.user_id == user_id).count()
+
+
+def _submit(client, headers, quiz, key):
+    return client.post(
+        "/quiz-attempts", json={"quiz_id": quiz["id"], "answers": ANSWERS},
+        headers={**headers, "Idempotency-Key": key}
+    )
+
+
+def test_retry_replays_stored_response(client, user, quiz):
+    headers, user_id = user
+    first = _submit(client, headers, quiz, "retry-1")
+    second = _submit(client, headers, quiz, "retry-1")
+    assert first.status_code == second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+    assert _attempts(user_id) == 1
+
+
+def test_response_is_stored_with_the_write(client, user, quiz):
+    headers, user_id = user
+    _submit(client, headers, quiz, "stored-1")
+    with SessionLocal() as db:
+        record = db.query(IdempotencyRecord).filter_by(user_id=user_id, idempotency_key="stored-1").one()
+        assert record.status_code == 200 and record.response_body
+
+
+def _insert_record(user_id, key, created_at, **fields):
+    with SessionLocal() as db:
+        db.add(IdempotencyRecord(
+            user_id=user_id, idempotency_key=key, fingerprint="x" * 64, created_at=created_at,
+            expires_at=datetime.utcnow() + timedelta(hours=1), **fields
+        ))
+        db.commit()
+
+
+def test_lapsed_claim_is_reclaimed(client, user, quiz):
+    headers, user_id = user
+    # A request that claimed the key and died before writing
+    _insert_record(user_id, "lapsed-1", datetime.utcnow() - timedelta(hours=1))
+    assert _submit(client, headers, quiz, "lapsed-1").status_code == 200
+    assert _attempts(user_id) == 1
+
+
+def test_old_completed_record_is_not_reclaimed(client, user, quiz):
+    headers, user_id = user
+    _submit(client, headers, quiz, "done-1")
+    with SessionLocal() as db:
+        record = db.query(IdempotencyRecord).filter_by(user_id=user_id, idempotency_key="done-1").one()
+        record.created_at = datetime.utcnow() - timedelta(hours=1)
+        db.commit()
+    response = _submit(client, headers, quiz, "done-1")
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert _attempts(user_id) == 1
+
+
+def test_write_rolls_back_when_claim_was_taken_over(client, user, quiz):
+    _, user_id = user
+    attempt = QuizAttemptCreate(quiz_id=quiz["id"], answers=ANSWERS)
+    # The claim is gone, as after a retry reclaimed it past the lease
+    unit = _completing(lambda session: _record_quiz_attempt(session, attempt, user_id), -1, QuizAttemptResponse)
+    with SessionLocal() as db:
+        with pytest.raises(HTTPException) as error:
+            unit(db)
+        db.rollback()
+    assert error.value.status_code == 409
+    assert _attempts(user_id) == 0
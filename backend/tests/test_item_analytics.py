@@ -0,0 +1,41 @@
+from database import SessionLocal
+from item_analytics import build_answer_matrix, refresh_quiz_analytics, UNANSWERED
+from models import QuizAttempt
+
+import numpy as np
+
+
+def test_out_of_range_answer_rejected_on_submit(client, user, quiz):
+    headers, _ = user
+    for answers in ([5, 2, 1, 0], [-1, 2, 1, 0], [40000, 2, 1, 0]):
+        response = client.post("/quiz-attempts", json={"quiz_id": quiz["id"], "answers": answers}, headers=headers)
+        assert response.status_code == 422
+
+
+def test_matrix_masks_out_of_range_answers():
+    matrix = build_answer_matrix([([40000, -70000, 1], None), ([2], [3])], np.array([3, 3, 3]))
+    assert matrix.tolist() == [[UNANSWERED, UNANSWERED, 1], [UNANSWERED, UNANSWERED, 2]]
+
+
+def test_refresh_survives_stored_out_of_range_answers(client, user, admin, quiz):
+    headers, user_id = user
+    client.post("/quiz-attempts", json={"quiz_id": quiz["id"], "answers": [1, 2, 1, 0]}, headers=headers)
+    with SessionLocal() as db:
+        # Written directly, as attempts stored before submissions were range-checked
+        db.add(QuizAttempt(user_id=user_id, quiz_id=quiz["id"], answers=[40000, 2, -5, 0], score=50, is_passed=False))
+        db.commit()
+        assert refresh_quiz_analytics(db, quiz["id"]) == 2
+        assert refresh_quiz_analytics(db, quiz["id"]) == 0
+
+    analytics = client.get(f"/quizzes/{quiz['id']}/analytics", headers=admin[0]).json()
+    assert analytics["attempts_processed"] == 2
+    assert [q["responses"] for q in analytics["questions"]] == [1, 2, 1, 2]
+
+
+def test_analytics_require_admin(client, user, admin, quiz):
+    url = f"/quizzes/{quiz['id']}/analytics"
+    assert client.get(url, headers=user[0]).status_code == 403
+    assert client.post(f"{url}/refresh", headers=user[0]).status_code == 403
+    response = client.post(f"{url}/refresh", headers=admin[0])
+    assert response.status_code == 200
+    assert response.json()["quiz_id"] == quiz["id"]
@@ -0,0 +1,76 @@
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import outbox
+from conftest import _workdir
+from database import SessionLocal, engine
+from models import AuditLog, Base
+from outbox import _claim_batch, enqueue, process_batch
+
+
+@pytest.fixture
+def private_engine():
+    """An outbox of its own, out of reach of the app's background worker."""
+    private = create_engine(f"sqlite:///{os.path.join(_workdir, f'outbox-{uuid.uuid4().hex[:8]}.db')}")
+    Base.metadata.create_all(bind=private)
+    yield private
+    private.dispose()
+
+
+def _drain():
+    while process_batch(engine):
+        pass
+
+
+def test_state_changes_are_audited_once(client, user, quiz):
+    headers, user_id = user
+    client.post(f"/users/{user_id}/progress", json={"scenario_id": quiz["scenario_id"], "completion_percentage": 50},
+                headers=headers)
+    _drain()
+    with SessionLocal() as db:
+        topics = [row.topic for row in db.query(AuditLog).filter(AuditLog.user_id == user_id).order_by(AuditLog.id)]
+    assert topics == ["session.login", "progress.updated"]
+
+
+def test_outbox_metrics_require_admin(client, user, admin):
+    assert client.get("/metrics/outbox").status_code == 403
+    assert client.get("/metrics/outbox", headers=user[0]).status_code == 403
+    response = client.get("/metrics/outbox", headers=admin[0])
+    assert response.status_code == 200
+    assert set(response.json()) == {"pending", "dead", "lag_seconds"}
+
+
+def test_interleaved_claims_lease_each_message_once(private_engine, monkeypatch):
+    delivered = []
+    monkeypatch.setitem(outbox._handlers, "test.record", [lambda db, message: delivered.append(message.id)])
+    with Session(private_engine) as db:
+        for i in range(3):
+            enqueue(db, "test.record", {"i": i})
+        db.commit()
+
+    now = datetime.utcnow()
+    first, second = Session(private_engine), Session(private_engine)
+    execute = first.execute
+    calls, claimed_by_second = [], []
+
+    def interleave_before_lease(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 2:
+            # The second worker leases the same ids between the first one's SELECT and UPDATE
+            claimed_by_second.extend(_claim_batch(second, now, 10))
+        return execute(*args, **kwargs)
+
+    monkeypatch.setattr(first, "execute", interleave_before_lease)
+    assert _claim_batch(first, now, 10) == []
+    assert [message.payload["i"] for message in claimed_by_second] == [0, 1, 2]
+    first.close()
+    second.close()
+
+    # Leased messages are neither delivered again nor picked up before the lease lapses
+    assert process_batch(private_engine) == 0
+    assert delivered == []
@@ -0,0 +1,93 @@
+import os
+import threading
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from conftest import _workdir
+from models import Base, ProgressEvent, ProgressRollupState, UserProgress
+from progress_log import get_scenario_rollups, refresh_rollups
+
+MONDAY = datetime(2024, 3, 4, 9, 0)
+
+
+@pytest.fixture
+def private_engine():
+    """A database of its own, out of reach of the app's rollup loop."""
+    path = os.path.join(_workdir, f"rollups-{uuid.uuid4().hex[:8]}.db")
+    private = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=private)
+    yield private
+    private.dispose()
+
+
+def _log(engine, *events):
+    with Session(engine) as db:
+        db.add_all(ProgressEvent(user_id=u, scenario_id=1, pct=pct, ts=ts) for u, pct, ts in events)
+        db.commit()
+
+
+def _watermark(engine):
+    with Session(engine) as db:
+        return db.get(ProgressRollupState, 1).last_event_id
+
+
+def test_fold_into_day_and_week_buckets(private_engine):
+    with Session(private_engine) as db:
+        db.add(UserProgress(user_id=1, scenario_id=1, completion_percentage=100, created_at=MONDAY))
+        db.commit()
+    _log(private_engine,
+         (1, 50.0, MONDAY.replace(hour=10)),
+         (1, 100.0, MONDAY.replace(hour=11)),
+         (2, 30.0, MONDAY.replace(day=5)))
+
+    with Session(private_engine) as db:
+        assert refresh_rollups(db) == 3
+        days = get_scenario_rollups(db, 1, "day")
+        weeks = get_scenario_rollups(db, 1, "week")
+    assert [(d["events"], d["completions"]) for d in days] == [(2, 1), (1, 0)]
+    assert days[0]["average_completion_percentage"] == 75.0
+    assert days[0]["average_minutes_to_complete"] == 120.0
+    assert [(w["bucket_start"], w["events"], w["completions"]) for w in weeks] == [(MONDAY.replace(hour=0), 3, 1)]
+
+
+def test_watermark_only_folds_new_events(private_engine):
+    _log(private_engine, (1, 10.0, MONDAY), (1, 20.0, MONDAY))
+    with Session(private_engine) as db:
+        assert refresh_rollups(db, batch_size=1) == 2
+        assert refresh_rollups(db) == 0
+    assert _watermark(private_engine) == 2
+
+    _log(private_engine, (1, 40.0, MONDAY))
+    with Session(private_engine) as db:
+        assert refresh_rollups(db) == 1
+        assert get_scenario_rollups(db, 1, "day")[0]["events"] == 3
+    assert _watermark(private_engine) == 3
+
+
+def test_concurrent_refreshes_fold_each_event_once(private_engine):
+    _log(private_engine, *[(user, 50.0, MONDAY) for user in range(40)])
+    processed, errors = [], []
+
+    def refresh():
+        try:
+            with Session(private_engine) as db:
+                processed.append(refresh_rollups(db, batch_size=7))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sum(processed) == 40
+    with Session(private_engine) as db:
+        assert get_scenario_rollups(db, 1, "day")[0]["events"] == 40
+        assert get_scenario_rollups(db, 1, "week")[0]["events"] == 40
+    assert _watermark(private_engine) == 40
@@ -0,0 +1,52 @@
+def submit(client, headers, payload):
+    return client.post("/quiz-attempts", json=payload, headers=headers)
+
+
+def test_full_quiz_graded(client, user, quiz):
+    headers, _ = user
+    response = submit(client, headers, {"quiz_id": quiz["id"], "answers": [1, 2, 1, 0]})
+    assert response.status_code == 200
+    assert response.json()["score"] == 100
+    assert response.json()["is_passed"]
+
+
+def test_duplicate_question_ids_rejected(client, user, quiz):
+    headers, _ = user
+    response = submit(client, headers, {"quiz_id": quiz["id"], "question_ids": [1, 1, 1], "answers": [1, 1, 1]})
+    assert response.status_code == 422
+
+
+def test_unknown_and_empty_question_ids_rejected(client, user, quiz):
+    headers, _ = user
+    for question_ids, answers in (([9], [0]), ([0], [0]), ([], [])):
+        response = submit(client, headers, {"quiz_id": quiz["id"], "question_ids": question_ids, "answers": answers})
+        assert response.status_code == 422
+    assert submit(client, headers, {"quiz_id": quiz["id"], "answers": []}).status_code == 422
+
+
+def test_partial_subset_graded_against_whole_quiz(client, user, quiz):
+    headers, _ = user
+    response = submit(client, headers, {"quiz_id": quiz["id"], "question_ids": [1], "answers": [1]})
+    assert response.status_code == 200
+    assert response.json()["score"] == 25
+    assert not response.json()["is_passed"]
+
+
+def test_sample_graded_against_issued_sample(client, user, quiz):
+    headers, _ = user
+    delivered = client.get(f"/scenarios/{quiz['scenario_id']}/quiz", params={"sample": 2}).json()
+    sampled = [question["id"] for question in delivered["questions"]]
+    key = {question["id"]: question["correct_answer"] for question in quiz["questions"]}
+    payload = {
+        "quiz_id": quiz["id"], "question_ids": sampled, "answers": [key[i] for i in sampled],
+        "sample_token": delivered["sample_token"],
+    }
+    assert submit(client, headers, payload).json()["score"] == 100
+
+    # Questions outside the issued sample cannot be swapped in
+    other = next(i for i in key if i not in sampled)
+    payload.update(question_ids=[other], answers=[key[other]])
+    assert submit(client, headers, payload).status_code == 422
+
+    payload.update(sample_token=delivered["sample_token"] + "x", question_ids=sampled[:1], answers=[key[sampled[0]]])
+    assert submit(client, headers, payload).status_code == 422
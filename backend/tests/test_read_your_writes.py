@@ -0,0 +1,27 @@
+from starlette.requests import Request
+
+import database
+from database import READ_AFTER_HEADER, pinned_to_primary, read_after_token
+
+
+def _request(headers):
+    raw = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_writes_return_a_pin_that_is_not_an_access_token(client, user, quiz):
+    headers, user_id = user
+    response = client.post(f"/users/{user_id}/progress",
+                           json={"scenario_id": quiz["scenario_id"], "completion_percentage": 20}, headers=headers)
+    assert response.status_code == 200
+    pin = response.headers[READ_AFTER_HEADER]
+    assert client.get("/auth/me", headers={"Authorization": f"Bearer {pin}"}).status_code == 401
+
+
+def test_pin_keeps_reads_on_the_primary_in_another_worker(user, monkeypatch):
+    headers, user_id = user
+    monkeypatch.setattr(database, "_recent_writers", {})  # A worker that did not handle the write
+    assert not pinned_to_primary(_request(headers))
+    assert pinned_to_primary(_request({**headers, READ_AFTER_HEADER: read_after_token(user_id)}))
+    assert not pinned_to_primary(_request({**headers, READ_AFTER_HEADER: read_after_token(user_id + 1)}))
+    assert not pinned_to_primary(_request({READ_AFTER_HEADER: read_after_token(user_id)}))
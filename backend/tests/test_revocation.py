@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from auth import verify_token
+from database import SessionLocal
+from models import UserSession
+from revocation import refresh_revocations
+
+
+def _logout_elsewhere(headers):
+    """End the token's session the way another worker's logout would, bypassing this worker's set."""
+    jti = verify_token(headers["Authorization"].split()[1])["jti"]
+    with SessionLocal() as db:
+        session = db.query(UserSession).filter(UserSession.session_token == jti).one()
+        session.is_active = False
+        session.logout_time = datetime.utcnow()
+        db.commit()
+    return jti
+
+
+def test_unseen_token_checked_against_sessions(client, user):
+    headers, _ = user
+    _logout_elsewhere(headers)
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+
+def test_refresh_picks_up_other_workers_logouts(client, user):
+    headers, user_id = user
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    jti = _logout_elsewhere(headers)
+    with SessionLocal() as db:
+        assert refresh_revocations(db, datetime.utcnow() - timedelta(minutes=1)) == [(user_id, jti)]
+    assert client.get("/auth/me", headers=headers).status_code == 401
@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from conftest import _workdir
+from database import engine
+from snapshots import build_snapshot
+
+HOLD_LOCK = """
+import sys, time
+sys.path.insert(0, {backend!r})
+from snapshots import _build_lock
+with _build_lock({root!r}):
+    print("locked", flush=True)
+    time.sleep(1.5)
+"""
+
+
+def test_build_waits_for_a_builder_in_another_process(client, quiz):
+    root = os.path.join(_workdir, "snapshots-locked")
+    os.makedirs(root, exist_ok=True)
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    holder = subprocess.Popen(
+        [sys.executable, "-c", HOLD_LOCK.format(backend=backend, root=root)],
+        stdout=subprocess.PIPE, text=True, env=os.environ.copy()
+    )
+    try:
+        assert holder.stdout.readline().strip() == "locked"
+        started = time.monotonic()
+        build_snapshot(engine, root=root)
+        assert time.monotonic() - started > 0.5
+    finally:
+        holder.wait(timeout=30)
+
+    with open(os.path.join(root, "manifest.json")) as f:
+        manifest = json.load(f)
+    for table in manifest["tables"].values():
+        for name, dtype in table["columns"].items():
+            size = os.path.getsize(os.path.join(root, table["path"], f"{name}.bin"))
+            assert size == table["rows"] * np.dtype(dtype).itemsize
@@ -0,0 +1,69 @@
+from database import SessionLocal
+from models import UserProgress
+from sync import allocate_seqs, current_seq
+
+
+def _sync(client, headers, since=0):
+    response = client.get("/sync", params={"since": since}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _progress(client, headers, user_id, scenario_id, pct):
+    response = client.post(f"/users/{user_id}/progress",
+                           json={"scenario_id": scenario_id, "completion_percentage": pct}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_sequence_numbers_are_allocated_in_order():
+    with SessionLocal() as db:
+        start = current_seq(db)
+        first = allocate_seqs(db, 3)
+        second = allocate_seqs(db, 1)
+        db.commit()
+        assert (first, second) == (start + 1, start + 4)
+        assert current_seq(db) == start + 4
+
+
+def test_cursor_returns_only_later_changes(client, user, quiz):
+    headers, user_id = user
+    _progress(client, headers, user_id, quiz["scenario_id"], 10)
+    cursor = _sync(client, headers)["cursor"]
+    assert _sync(client, headers, cursor)["progress"] == []
+
+    _progress(client, headers, user_id, quiz["scenario_id"], 60)
+    changes = _sync(client, headers, cursor)
+    assert changes["cursor"] > cursor
+    assert [p["completion_percentage"] for p in changes["progress"]] == [60]
+    assert changes["quizzes"] == [] and changes["scenarios"] == []
+
+
+def test_deletes_appear_as_tombstones_for_their_user(client, user, quiz):
+    headers, user_id = user
+    progress = _progress(client, headers, user_id, quiz["scenario_id"], 30)
+    cursor = _sync(client, headers)["cursor"]
+    with SessionLocal() as db:
+        db.delete(db.get(UserProgress, progress["id"]))
+        db.commit()
+
+    changes = _sync(client, headers, cursor)
+    assert changes["deleted"] == [{"entity": "progress", "id": progress["id"]}]
+    assert changes["progress"] == []
+
+
+def test_tombstones_are_private_to_their_user(client, user, admin, quiz):
+    headers, user_id = user
+    progress = _progress(client, headers, user_id, quiz["scenario_id"], 30)
+    with SessionLocal() as db:
+        db.delete(db.get(UserProgress, progress["id"]))
+        db.commit()
+    assert {"entity": "progress", "id": progress["id"]} not in _sync(client, admin[0])["deleted"]
+
+
+def test_synced_quizzes_carry_no_answer_key(client, user, quiz):
+    headers, _ = user
+    synced = [q for q in _sync(client, headers)["quizzes"] if q["id"] == quiz["id"]]
+    assert len(synced) == 1
+    for question in synced[0]["questions"]:
+        assert set(question) == {"id", "question_text", "options"}
@@ -0,0 +1,42 @@
+import json
+
+
+def _import(client, admin, rows):
+    return client.post(
+        "/admin/users/import", content=json.dumps(rows),
+        headers={**admin[0], "Content-Type": "application/json"}
+    )
+
+
+def test_non_object_row_rejected_before_streaming(client, admin):
+    response = _import(client, admin, [{"email": "a@example.com", "username": "a", "password": "pw"}, "notadict"])
+    assert response.status_code == 400
+    assert "Row 2" in response.json()["detail"]
+
+
+def test_non_string_field_rejected_before_streaming(client, admin):
+    for bad in ({"email": ["a"]}, {"full_name": 7}, {"password": 12345}):
+        rows = [
+            {"email": "typed-ok@example.com", "username": "typedok", "password": "pw"},
+            {"email": "typed-bad@example.com", "username": "typedbad", "password": "pw", **bad},
+        ]
+        response = _import(client, admin, rows)
+        assert response.status_code == 400
+        assert response.json()["detail"].endswith(f"Row 2 has non-string fields: {next(iter(bad))}")
+
+
+def test_import_reports_every_row(client, admin):
+    rows = [
+        {"email": "import-1@example.com", "username": "import1", "password": "secret1"},
+        {"email": "import-2@example.com", "username": "import2"},
+        {"email": "import-1@example.com", "username": "import3", "password": "secret3"},
+    ]
+    response = _import(client, admin, rows)
+    assert response.status_code == 200
+    results = {result["row"]: result for result in map(json.loads, response.text.splitlines())}
+    assert {row: result["status"] for row, result in results.items()} == {1: "created", 2: "invalid", 3: "conflict"}
+
+
+def test_import_requires_admin(client, user):
+    response = client.post("/admin/users/import", content="[]", headers={**user[0], "Content-Type": "application/json"})
+    assert response.status_code == 403
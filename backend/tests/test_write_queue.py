@@ -0,0 +1,97 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import write_queue
+from conftest import _workdir
+from models import AuditLog, Base
+from write_queue import WriteQueue, _run_batch
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    """Point the writer at a database of its own; returns a factory for its sessions."""
+    path = os.path.join(_workdir, f"writes-{uuid.uuid4().hex[:8]}.db")
+    private = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=private)
+    sessions = sessionmaker(autocommit=False, autoflush=False, bind=private, expire_on_commit=False)
+    monkeypatch.setattr(write_queue, "WriterSession", sessions)
+    yield sessions
+    private.dispose()
+
+
+def _insert(message_id):
+    def unit(db):
+        db.add(AuditLog(message_id=message_id, topic="test", payload={}, occurred_at=datetime.utcnow()))
+        db.flush()
+        return message_id
+    return unit
+
+
+def _failing(message_id):
+    def unit(db):
+        _insert(message_id)(db)
+        raise ValueError("rejected")
+    return unit
+
+
+def _stored(sessions):
+    with sessions() as db:
+        return sorted(message_id for (message_id,) in db.query(AuditLog.message_id))
+
+
+def test_concurrent_units_commit_as_one_batch(writer, monkeypatch):
+    batches = []
+
+    def recording_batch(units):
+        batches.append(len(units))
+        return _run_batch(units)
+
+    monkeypatch.setattr(write_queue, "_run_batch", recording_batch)
+
+    async def submit_all():
+        queue = WriteQueue(max_batch=10, linger_ms=200)
+        task = queue.start()
+        try:
+            return await asyncio.gather(*(queue.submit(_insert(i)) for i in range(3)))
+        finally:
+            task.cancel()
+
+    assert asyncio.run(submit_all()) == [0, 1, 2]
+    assert batches == [3]
+    assert _stored(writer) == [0, 1, 2]
+
+
+def test_failing_unit_only_rolls_back_its_savepoint(writer):
+    outcomes = _run_batch([_insert(1), _failing(2), _insert(3)])
+    assert [ok for ok, _ in outcomes] == [True, False, True]
+    assert isinstance(outcomes[1][1], ValueError)
+    assert _stored(writer) == [1, 3]
+
+
+def test_failed_batch_commit_retries_units_alone(writer, monkeypatch):
+    class FailingFirstCommit(Session):
+        failed = False
+
+        def commit(self):
+            if not FailingFirstCommit.failed:
+                FailingFirstCommit.failed = True
+                raise RuntimeError("disk I/O error")
+            super().commit()
+
+    monkeypatch.setattr(write_queue, "WriterSession", sessionmaker(
+        class_=FailingFirstCommit, autocommit=False, autoflush=False, bind=writer.kw["bind"], expire_on_commit=False
+    ))
+    alone = []
+    run_alone = write_queue._run_alone
+    monkeypatch.setattr(write_queue, "_run_alone", lambda unit: alone.append(unit) or run_alone(unit))
+
+    outcomes = _run_batch([_insert(1), _failing(2), _insert(3)])
+    assert len(alone) == 3
+    assert [ok for ok, _ in outcomes] == [True, False, True]
+    assert _stored(writer) == [1, 3]  # The failed batch left nothing behind
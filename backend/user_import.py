@@ -0,0 +1,165 @@
+"""
+Bulk cohort enrollment from CSV or JSON.
+
+Conflicts with existing users are found with one set-based query per chunk of
+emails/usernames instead of a SELECT per user. bcrypt hashing, which dominates
+the cost, runs on a process pool so an import takes roughly
+rows x hash cost / cores. Users are inserted in batched transactions and a
+result is yielded per input row so callers can stream progress.
+
+Results come in completion order, not file order: rows rejected up front
+(invalid or conflicting) first, then created rows batch by batch. Every result
+carries its 1-based "row" number for matching it back to the input.
+"""
+
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from auth import get_password_hash
+from config import IMPORT_BATCH_SIZE, IMPORT_HASH_WORKERS
+from models import User
+
+REQUIRED_FIELDS = ("email", "username", "password")
+TEXT_FIELDS = REQUIRED_FIELDS + ("full_name",)  # Strings, or null/absent
+
+# Stay well under SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 400
+
+
+def parse_rows(content: bytes, fmt: str) -> List[dict]:
+    """Parse a CSV (with a header row) or a JSON list of user objects.
+
+    Raises ValueError for a malformed file, including a JSON row that is not
+    an object or has a non-string user field, before any row is imported.
+    """
+    text = content.decode("utf-8-sig")
+    if fmt == "json":
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise ValueError("JSON import must be a list of user objects")
+        for number, row in enumerate(rows, start=1):
+            if not isinstance(row, dict):
+                raise ValueError(f"Row {number} is not a user object")
+            wrong = [field for field in TEXT_FIELDS if not isinstance(row.get(field), (str, type(None)))]
+            if wrong:
+                raise ValueError(f"Row {number} has non-string fields: {', '.join(wrong)}")
+        return rows
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(text)))
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def find_conflicts(db: Session, emails: Iterable[str], usernames: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+    """Emails and usernames that already exist, in a few set-based queries."""
+    emails, usernames = list(emails), list(usernames)
+    taken_emails, taken_usernames = set(), set()
+    for start in range(0, max(len(emails), len(usernames)), _LOOKUP_CHUNK):
+        email_chunk = emails[start:start + _LOOKUP_CHUNK]
+        username_chunk = usernames[start:start + _LOOKUP_CHUNK]
+        rows = db.execute(
+            select(User.email, User.username).where(
+                or_(User.email.in_(email_chunk), User.username.in_(username_chunk))
+            )
+        ).all()
+        for email, username in rows:
+            taken_emails.add(email)
+            taken_usernames.add(username)
+    return taken_emails & set(emails), taken_usernames & set(usernames)
+
+
+def _validate(rows: List[dict]) -> Tuple[List[Tuple[int, dict]], Dict[int, dict]]:
+    """Split rows into candidates and per-row rejections (missing fields, repeats in file)."""
+    candidates, rejected = [], {}
+    seen_emails, seen_usernames = set(), set()
+    for number, row in enumerate(rows, start=1):
+        row = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items()}
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            rejected[number] = {"row": number, "email": row.get("email"), "status": "invalid",
+                                "detail": f"Missing fields: {', '.join(missing)}"}
+        elif row["email"] in seen_emails or row["username"] in seen_usernames:
+            rejected[number] = {"row": number, "email": row["email"], "status": "conflict",
+                                "detail": "Duplicate email or username in import file"}
+        else:
+            seen_emails.add(row["email"])
+            seen_usernames.add(row["username"])
+            candidates.append((number, row))
+    return candidates, rejected
+
+
+def _insert_batch(db: Session, batch: List[Tuple[int, dict, str]]) -> Iterator[dict]:
+    users = [
+        User(email=row["email"], username=row["username"], hashed_password=hashed,
+             full_name=row.get("full_name") or None)
+        for _, row, hashed in batch
+    ]
+    try:
+        db.add_all(users)
+        db.commit()
+    except IntegrityError:
+        # Someone registered one of these meanwhile; isolate it row by row
+        db.rollback()
+        for number, row, hashed in batch:
+            yield from _insert_batch_one(db, number, row, hashed)
+        return
+    for (number, row, _), user in zip(batch, users):
+        yield {"row": number, "email": row["email"], "status": "created", "id": user.id}
+
+
+def _insert_batch_one(db: Session, number: int, row: dict, hashed: str) -> Iterator[dict]:
+    user = User(email=row["email"], username=row["username"], hashed_password=hashed,
+                full_name=row.get("full_name") or None)
+    db.add(user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        yield {"row": number, "email": row["email"], "status": "conflict",
+               "detail": "Email or username already registered"}
+        return
+    yield {"row": number, "email": row["email"], "status": "created", "id": user.id}
+
+
+def import_users(
+    db: Session,
+    rows: List[dict],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    workers: int = IMPORT_HASH_WORKERS
+) -> Iterator[dict]:
+    """Create users from parsed rows, yielding one result per input row in completion order."""
+    candidates, rejected = _validate(rows)
+    taken_emails, taken_usernames = find_conflicts(
+        db, (row["email"] for _, row in candidates), (row["username"] for _, row in candidates)
+    )
+    to_create = []
+    for number, row in candidates:
+        if row["email"] in taken_emails or row["username"] in taken_usernames:
+            rejected[number] = {"row": number, "email": row["email"], "status": "conflict",
+                                "detail": "Email or username already registered"}
+        else:
+            to_create.append((number, row))
+
+    yield from (rejected[number] for number in sorted(rejected))
+    if not to_create:
+        return
+
+    passwords = [str(row["password"]) for _, row in to_create]
+    chunksize = max(1, min(64, len(passwords) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps every core hashing while earlier batches are inserted
+        hashes = pool.map(get_password_hash, passwords, chunksize=chunksize)
+        batch = []
+        for (number, row), hashed in zip(to_create, hashes):
+            batch.append((number, row, hashed))
+            if len(batch) >= batch_size:
+                yield from _insert_batch(db, batch)
+                batch = []
+        if batch:
+            yield from _insert_batch(db, batch)
@@ -0,0 +1,130 @@
+"""
+Group-commit single-writer queue for the hot write paths.
+
+With SQLite every write transaction takes the database lock and pays its own
+fsync on commit, so concurrent handlers queue up on the lock or fail with
+"database is locked". When WRITE_QUEUE_ENABLED is set, handlers submit write
+units (functions of a session) instead of committing themselves. One writer
+collects units for up to WRITE_QUEUE_LINGER_MS or WRITE_QUEUE_MAX_BATCH units,
+runs each in its own SAVEPOINT in a single transaction and commits once. Each
+caller gets its own result or exception; a unit that fails only rolls back its
+savepoint. If the batch commit itself fails, the units are retried one
+transaction each so a single bad write cannot fail its neighbours.
+
+Units run on the writer's thread and must not block on anything but the
+database: password hashing and other CPU work belongs in the handler. They
+may run twice if a batch commit fails, so anything that must happen after
+commit (broker events, read-your-writes pins) stays in the handler too.
+"""
+
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+
+from config import WRITE_QUEUE_ENABLED, WRITE_QUEUE_MAX_BATCH, WRITE_QUEUE_LINGER_MS
+from database import begin_write, writer_engine
+
+T = TypeVar("T")
+
+WriteUnit = Callable[[Session], T]
+
+# Results outlive the batch session, so keep their loaded attributes on commit
+WriterSession = sessionmaker(autocommit=False, autoflush=False, bind=writer_engine, expire_on_commit=False)
+
+
+def _run_batch(units: List[WriteUnit]) -> List[Tuple[bool, Any]]:
+    """Run units in one transaction; returns (ok, result or exception) per unit."""
+    outcomes = []
+    with WriterSession() as db:
+        begin_write(db)
+        for unit in units:
+            try:
+                with db.begin_nested():
+                    outcomes.append((True, unit(db)))
+            except Exception as e:
+                outcomes.append((False, e))
+        try:
+            db.commit()
+            return outcomes
+        except Exception:
+            db.rollback()
+
+    return [_run_alone(unit) for unit in units]
+
+
+def _run_alone(unit: WriteUnit) -> Tuple[bool, Any]:
+    with WriterSession() as db:
+        try:
+            begin_write(db)
+            result = unit(db)
+            db.commit()
+            return True, result
+        except Exception as e:
+            db.rollback()
+            return False, e
+
+
+class WriteQueue:
+    """Collects write units and commits them in batches from a single writer."""
+
+    def __init__(self, max_batch: int = WRITE_QUEUE_MAX_BATCH, linger_ms: float = WRITE_QUEUE_LINGER_MS):
+        self.max_batch = max_batch
+        self.linger = linger_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+
+    def start(self) -> asyncio.Task:
+        """Start the writer on the running loop; the caller cancels the task on shutdown."""
+        self._queue = asyncio.Queue()
+        return asyncio.create_task(self._drain())
+
+    async def submit(self, unit: WriteUnit) -> T:
+        """Queue a unit and wait until its batch has committed."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((unit, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[WriteUnit, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.linger
+        while len(batch) < self.max_batch:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _drain(self):
+        while True:
+            batch = await self._collect()
+            units = [unit for unit, future in batch if not future.cancelled()]
+            futures = [future for _, future in batch if not future.cancelled()]
+            try:
+                outcomes = await run_in_threadpool(_run_batch, units)
+            except Exception as e:
+                outcomes = [(False, e)] * len(units)
+            for future, (ok, value) in zip(futures, outcomes):
+                if future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+
+write_queue = WriteQueue()
+
+
+async def run_write(db: Session, unit: WriteUnit) -> T:
+    """Run a write unit through the queue when enabled, else on db with its own commit."""
+    if WRITE_QUEUE_ENABLED:
+        # End the request's read transaction so its connection goes back to the pool while it waits
+        db.commit()
+        return await write_queue.submit(unit)
+    result = unit(db)
+    db.commit()
+    return result